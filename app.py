@@ -1,18 +1,37 @@
-from flask import Flask, render_template, request, redirect, url_for, flash, jsonify
+from flask import Flask, Response, render_template, stream_template, request, redirect, url_for, flash, jsonify
 import sqlite3
-import random
 import json
-import math
 import csv
 import io
 
+import catalog
+import db
+import encounter_engine
+import encounter_rolls
+import encounter_sim
+import events
+import exp_tables
+import horde
+import level_gains
+import listing
+import migrations
+import move_store
+import seeds
+import settlement
+import species_stats
+import stat_blocks
+import trainer_snapshot
+import trainer_stats
+import trainer_store
+from db import get_db
+from search import search_moves, search_species
+
 app = Flask(__name__)
 app.secret_key = 'your-secret-key-here'  # For flash messages
 
-def get_db():
-    conn = sqlite3.connect('database.db')
-    conn.row_factory = sqlite3.Row
-    return conn
+# Schema changes run once here, never inside request handlers
+migrations.run()
+db.init_app(app)
 
 @app.route('/')
 def index():
@@ -21,139 +40,223 @@ def index():
 @app.route('/pokemon', methods=['GET', 'POST'])
 def pokemon():
     conn = get_db()
-    c = conn.cursor()
-    results = []
-    search = ''
+    search, after, offset = search_args()
+    next_cursor = next_offset = None
+    size = listing.page_size(request.args.get('page_size'))
     
-    if request.method == 'POST':
-        search = request.form.get('search', '').strip()
-        # FIXED QUERY: Only select columns that exist after cleanup
-        c.execute("""
-            SELECT 
-                name,
-                HP,
-                Atk AS Attack,
-                Def AS Defense,
-                SpA AS SpAtk,
-                SpD AS SpDef,
-                Spe AS Speed,
-                capabilities,
-                skills,
-                abilities,
-                stats
-            FROM pokemon 
-            WHERE name LIKE ? 
-            ORDER BY name
-        """, (f"%{search}%",))
-        results = c.fetchall()
+    if request.method == 'POST' and not search:
+        return redirect(url_for('pokemon'))
+    if search:
+        results = []
+        if after is None:
+            # Ranked full-text match on name/capabilities/skills/abilities
+            results, next_offset = search_species(conn, search, limit=size, offset=offset)
+        if not results and not offset:
+            # Fall back to a name substring match (e.g. "izard")
+            results, next_cursor = listing.species_by_name_substring(conn, search, after, size)
     else:
-        # Show first 50
-        c.execute("""
-            SELECT 
-                name,
-                HP,
-                Atk AS Attack,
-                Def AS Defense,
-                SpA AS SpAtk,
-                SpD AS SpDef,
-                Spe AS Speed,
-                capabilities,
-                skills,
-                abilities
-            FROM pokemon 
-            ORDER BY name 
-            LIMIT 50
-        """)
-        results = c.fetchall()
+        # Keyset-paginated summary listing
+        results, next_cursor = listing.species_page(conn, after, size)
     
-    conn.close()
-    return render_template('pokemon.html', results=results, search=search)
+    return render_template('pokemon.html', results=results, search=search,
+                           next_cursor=next_cursor, next_offset=next_offset, page_size=size)
+
+def search_args():
+    """(search text, name cursor, rank offset) for a list page.
+
+    The search comes from the form on the first page and from the query
+    string on the pages after it.
+    """
+    source = request.form if request.method == 'POST' else request.args
+    offset = max(request.args.get('offset', 0, type=int), 0)
+    return source.get('search', '').strip(), request.args.get('after'), offset
+
+@app.route('/api/pokemon/<name>')
+def pokemon_detail(name):
+    row = listing.species_detail(get_db(), name)
+    if not row:
+        return jsonify({'error': f"Pokémon '{name}' not found"}), 404
+    return jsonify(dict(row))
 
 @app.route('/moves', methods=['GET', 'POST'])
 def moves():
     conn = get_db()
-    c = conn.cursor()
-    results = []
-    search = ''
-    if request.method == 'POST':
-        search = request.form.get('search', '').strip()
-        c.execute("SELECT name, ac, damage, effect FROM moves WHERE name LIKE ? ORDER BY name", (f"%{search}%",))
-        results = c.fetchall()
-    conn.close()
-    return render_template('moves.html', results=results, search=search)
+    search, after, offset = search_args()
+    next_cursor = next_offset = None
+    size = listing.page_size(request.args.get('page_size'))
+    
+    if request.method == 'POST' and not search:
+        return redirect(url_for('moves'))
+    if search:
+        results = []
+        if after is None:
+            # Ranked full-text match on name/effect, with highlighted excerpts
+            results, next_offset = search_moves(conn, search, limit=size, offset=offset)
+        if not results and not offset:
+            results, next_cursor = listing.moves_by_name_substring(conn, search, after, size)
+    else:
+        results, next_cursor = listing.moves_page(conn, after, size)
+    
+    return render_template('moves.html', results=results, search=search,
+                           next_cursor=next_cursor, next_offset=next_offset, page_size=size)
+
+@app.route('/api/moves')
+def move_query():
+    """Filter/sort moves on typed damage columns, e.g.
+    /api/moves?ac=2&db_min=6&db_max=9&sort=avg&order=desc
+    """
+    try:
+        query = move_store.parse_query(request.args)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    rows = move_store.query_moves(get_db(), limit=listing.page_size(request.args.get('limit')), **query)
+    return jsonify([dict(row) for row in rows])
+
+@app.route('/api/moves/<name>')
+def move_detail(name):
+    row = listing.move_detail(get_db(), name)
+    if not row:
+        return jsonify({'error': f"Move '{name}' not found"}), 404
+    return jsonify(dict(row))
 
 @app.route('/exp_calc', methods=['GET', 'POST'])
 def exp_calc():
     result = ""
     if request.method == 'POST':
         try:
-            exp_needed = int(request.form['exp_needed'])
             base_exp = int(request.form['base_exp'])
             defeated_level = int(request.form['defeated_level'])
             gaining_level = int(request.form['gaining_level'])
-            growth_rate = request.form['growth_rate'].lower().strip()
+            growth_rate = exp_tables.growth_rate(request.form['growth_rate'])
             stored = request.form.get('stored') == 'yes'
+            # Stored EXP is progress into the current level
             stored_exp_value = int(request.form.get('stored_exp', 0)) if stored else 0
 
-            multipliers = {
-                "erratic": [(1, 30, 1.2), (31, 60, 1.0), (61, 100, 0.8)],
-                "fast": [(1, 30, 1.1), (31, 60, 1.1), (61, 100, 1.1)],
-                "medium fast": [(1, 30, 1.0), (31, 60, 1.0), (61, 100, 1.0)],
-                "medium slow": [(1, 30, 0.9), (31, 60, 1.0), (61, 100, 1.1)],
-                "slow": [(1, 30, 0.8), (31, 60, 0.9), (61, 100, 1.0)],
-            }
-            if growth_rate not in multipliers:
-                result = "Invalid growth rate. Use: erratic, fast, medium fast, medium slow, slow"
-            else:
-                multiplier = 0
-                for start, end, mult in multipliers[growth_rate]:
-                    if start <= gaining_level <= end:
-                        multiplier = mult
-                        break
-                if multiplier == 0:
-                    result = "Level out of range for this growth rate"
-                else:
-                    base_exp_value = (base_exp * defeated_level) / 7
-                    exp_gained = base_exp_value * multiplier
-                    exp_gained_rounded = round(exp_gained)
-                    total_exp = stored_exp_value + exp_gained_rounded
-                    result = f"EXP Gained: <strong>{exp_gained_rounded}</strong><br>Total: <strong>{total_exp} / {exp_needed}</strong>"
-        except Exception as e:
+            exp_gained = exp_tables.exp_gain(base_exp, defeated_level, growth_rate, gaining_level)
+            start = exp_tables.exp_for_level(growth_rate, gaining_level) + stored_exp_value
+            after = exp_tables.gain(growth_rate, gaining_level, start, exp_gained)
+            result = f"EXP Gained: <strong>{exp_gained}</strong><br>Level: <strong>{gaining_level} → {after.level}</strong>"
+            if after.levels_gained:
+                result += f" (+{after.levels_gained})"
+            if after.level < exp_tables.MAX_LEVEL:
+                result += f"<br>Progress: <strong>{after.exp_into_level} / {after.exp_into_level + after.exp_to_next}</strong>"
+        except (KeyError, ValueError) as e:
             result = f"Error: {str(e)} — check your numbers"
     return render_template('exp_calc.html', result=result)
 
+@app.route('/api/exp', methods=['POST'])
+def exp_batch():
+    """EXP for many (defeated, gainer) pairs in one call:
+    {"pairs": [{"base_exp": 64, "defeated_level": 12,
+                "gainer": {"level": 10, "exp": 1200, "growth_rate": "slow"}}]}
+    "exp" is the gainer's total EXP (defaults to its level's threshold).
+    """
+    body = request.get_json(silent=True)
+    if not isinstance(body, dict):
+        return jsonify({'error': 'Expected a JSON object with a "pairs" list'}), 400
+    pairs = body.get('pairs')
+    if not isinstance(pairs, list) or not pairs:
+        return jsonify({'error': '"pairs" must be a non-empty list'}), 400
+    
+    results = []
+    try:
+        for i, pair in enumerate(pairs, 1):
+            gainer = pair.get('gainer') or {}
+            rate = exp_tables.growth_rate(gainer.get('growth_rate'))
+            level = int(gainer.get('level', 1))
+            earned = exp_tables.exp_gain(int(pair['base_exp']), int(pair['defeated_level']), rate, level)
+            after = exp_tables.gain(rate, level, int(gainer.get('exp', 0)), earned)
+            results.append(dict(after._asdict(), exp_gained=earned))
+    except (AttributeError, KeyError, TypeError, ValueError) as e:
+        return jsonify({'error': f"pair {i}: {e}"}), 400
+    return jsonify({'results': results})
+
+@app.route('/api/exp/table')
+def exp_table():
+    try:
+        rate = exp_tables.growth_rate(request.args.get('growth_rate'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify({'growth_rate': rate, 'totals': exp_tables.TOTALS[rate]})
+
 @app.route('/level_up', methods=['GET', 'POST'])
 def level_up():
     result = None
+    preview = None
+    seed = None
     if request.method == 'POST':
         try:
+            seed = seeds.parse(request.form.get('seed'))
             rolls_count = int(request.form['rolls_count'])
             is_neutral = request.form.get('is_neutral') == 'yes'
             boosted = request.form.get('boosted_stat') if not is_neutral else None
             hindered = request.form.get('hindered_stat') if not is_neutral else None
 
-            stats = ['HP', 'Attack', 'Defense', 'Special Attack', 'Special Defense', 'Speed']
-            total = {s: 0 for s in stats}
+            # One binomial draw per stat, however many levels
+            stat_offsets = level_gains.offsets(boosted, hindered)
+            gains = level_gains.roll(seeds.numpy_rng(seed), [rolls_count], stat_offsets)[0]
+            result = dict(zip(stat_blocks.LABELS, gains.tolist()))
+            preview = level_gains.distribution(rolls_count, stat_offsets)
+        except (KeyError, ValueError):
+            result = "Invalid input"
+    return render_template('level_up.html', result=result, preview=preview, seed=seed)
 
-            for _ in range(rolls_count):
-                for stat in stats:
-                    roll = random.randint(1, 2)
-                    mod = roll
-                    if not is_neutral:
-                        if stat == boosted: mod += 1
-                        if stat == hindered: mod = max(mod - 1, 0)
-                    total[stat] += mod
+@app.route('/api/level_up', methods=['GET', 'POST'])
+def level_up_api():
+    """Stat gains for multi-level jumps.
 
-            result = total
-        except:
-            result = "Invalid input"
-    return render_template('level_up.html', result=result)
+    GET ?levels=12&nature=Adamant (or &boosted=Attack&hindered=Speed)
+    rolls one Pokémon and includes the exact gain distribution.  POST
+    {"seed": 1, "pokemon": [{"levels": 12, "nature": "Adamant"}, ...]}
+    rolls a whole batch in one call.
+    """
+    try:
+        if request.method == 'GET':
+            args = request.args
+            seed = seeds.parse(args.get('seed'))
+            levels = args.get('levels', 1, type=int)
+            if args.get('nature'):
+                stat_offsets = level_gains.nature_offsets(args['nature'])
+            else:
+                stat_offsets = level_gains.offsets(args.get('boosted') or None, args.get('hindered') or None)
+            gains = level_gains.roll(seeds.numpy_rng(seed), [levels], stat_offsets)[0]
+            return jsonify({
+                'seed': seed,
+                'levels': levels,
+                'gains': dict(zip(stat_blocks.LABELS, gains.tolist())),
+                'distribution': level_gains.distribution(levels, stat_offsets),
+            })
+        
+        body = request.get_json(silent=True) or {}
+        seed = seeds.parse(body.get('seed'))
+        entries = body.get('pokemon')
+        if not isinstance(entries, list) or not entries:
+            raise ValueError('"pokemon" must be a non-empty list')
+        levels = [int(e.get('levels', 1)) for e in entries]
+        stat_offsets = [
+            level_gains.nature_offsets(e['nature']) if e.get('nature')
+            else level_gains.offsets(e.get('boosted'), e.get('hindered'))
+            for e in entries]
+        gains = level_gains.roll(seeds.numpy_rng(seed), levels, stat_offsets)
+    except (AttributeError, TypeError, ValueError) as e:
+        return jsonify({'error': str(e)}), 400
+    
+    return jsonify({
+        'seed': seed,
+        'gains': [dict(zip(stat_blocks.LABELS, row)) for row in gains.tolist()],
+    })
 
 @app.route('/severity', methods=['GET', 'POST'])
 def severity():
     result = None
+    seed = None
     if request.method == 'POST':
-        sev = random.randint(1, 10)
+        try:
+            seed = seeds.parse(request.form.get('seed'))
+        except ValueError:
+            return render_template('severity.html', result="Invalid seed", seed=None)
+        rng = seeds.rng(seed)
+        sev = rng.randint(1, 10)
         if sev == 1: num, lev, extra = 1, "equal to your weakest", ""
         elif sev == 2: num, lev, extra = 1, "+1 above your weakest", ""
         elif sev == 3: num, lev, extra = 2, "+2 above your weakest", ""
@@ -163,9 +266,9 @@ def severity():
         elif sev == 7: num, lev, extra = 4, "+2 above your strongest", ""
         elif sev == 8: num, lev, extra = 5, "+3 above your strongest", ""
         elif sev == 9: num, lev, extra = 6, "+4 above your strongest", "1 evolved"
-        else: num, lev, extra = 6, "+5 above your strongest", f"{random.randint(1,2)} evolved (optimized movesets)"
+        else: num, lev, extra = 6, "+5 above your strongest", f"{rng.randint(1,2)} evolved (optimized movesets)"
         result = f"<strong>Severity {sev}</strong><br>{num} Pokémon<br>Level: {lev}<br>{extra}"
-    return render_template('severity.html', result=result)
+    return render_template('severity.html', result=result, seed=seed)
 
 
 @app.route('/encounters', methods=['GET', 'POST'])
@@ -175,36 +278,14 @@ def encounters():
     message = ""
     tables = []
     
-    try:
-        tables_raw = c.execute("SELECT table_name FROM encounters").fetchall()
-        tables = [t['table_name'] for t in tables_raw]
-    except:
-        c.execute('''CREATE TABLE IF NOT EXISTS encounters
-                     (table_name TEXT PRIMARY KEY, data TEXT)''')
-        conn.commit()
-        tables = []
-    
-    # Get Pokémon names for the form
-    pokemons_raw = c.execute("SELECT name, stats FROM pokemon ORDER BY name").fetchall()
-    pokemons = {}
-    for p in pokemons_raw:
-        try:
-            name = p['name'].replace('.', '').strip()
-            stats_str = p['stats']
-            if stats_str:
-                try:
-                    stats = json.loads(stats_str)
-                except json.JSONDecodeError:
-                    stats = {}
-            else:
-                stats = {}
-            pokemons[name] = stats
-        except Exception as e:
-            print(f"Error processing {p['name']}: {e}")
-            pokemons[p['name'].replace('.', '').strip()] = {}
-    
+    tables_raw = c.execute("SELECT table_name FROM encounters").fetchall()
+    tables = [t['table_name'] for t in tables_raw]
+
+    # Species names + parsed stats come from the shared catalog
+    pokemons = catalog.get_catalog(conn)
+
     results = []
-    selected_table = None
+    session = None
     mode = request.args.get('mode', 'manual')
     
     if request.method == 'POST':
@@ -226,11 +307,18 @@ def encounters():
                 'vrare': json.loads(request.form.get('vrare', '[]'))
             }
             
-            c.execute("INSERT OR REPLACE INTO encounters (table_name, data) VALUES (?, ?)",
-                     (table_name, json.dumps(data)))
-            conn.commit()
-            tables.append(table_name)
-            message = f"Table '{table_name}' saved!"
+            # Only catalog species can be rolled with stats
+            unknown = [name for rarity in ('common', 'uncommon', 'rare', 'vrare')
+                       for name in data[rarity] if name not in pokemons]
+            if unknown:
+                message = f"Unknown Pokémon: {', '.join(map(str, unknown))}. Table not saved."
+            else:
+                version = encounter_engine.save_table(conn, table_name, data)
+                conn.commit()
+                events.hub.publish(events.encounter_channel(table_name), 'table',
+                                   {'table_name': table_name, 'version': version})
+                tables.append(table_name)
+                message = f"Table '{table_name}' saved!"
             
         elif action == 'delete':
             # Delete table logic
@@ -238,255 +326,121 @@ def encounters():
             if table_name:
                 c.execute("DELETE FROM encounters WHERE table_name=?", (table_name,))
                 conn.commit()
+                events.hub.publish(events.encounter_channel(table_name), 'deleted', {'table_name': table_name})
                 if table_name in tables:
                     tables.remove(table_name)
                 message = f"Table '{table_name}' deleted!"
             
         elif action == 'roll':
-            # Clear previous results when rolling
-            results = []
-            
-            num_rolls = int(request.form.get('num_rolls', 1))
-            row = c.execute("SELECT data FROM encounters WHERE table_name=?", (table_name,)).fetchone()
-            
-            if row:
-                try:
-                    data = json.loads(row['data'])
-                except json.JSONDecodeError:
-                    message = f"Error loading table '{table_name}' data!"
-                    conn.close()
-                    return render_template('encounters.html', tables=tables, message=message, results=results, pokemons=list(pokemons.keys()), mode=mode)
-                
-                # WEIGHTED SEVERITY SYSTEM
-                severity_weights = [
-                    (1, 0.30),   # 30% chance
-                    (2, 0.20),   # 20% chance
-                    (3, 0.15),   # 15% chance
-                    (4, 0.10),   # 10% chance
-                    (5, 0.07),   # 7% chance
-                    (6, 0.06),   # 6% chance
-                    (7, 0.05),   # 5% chance
-                    (8, 0.03),   # 3% chance
-                    (9, 0.02),   # 2% chance
-                    (10, 0.02)   # 2% chance
-                ]
-                
-                for roll_num in range(num_rolls):
-                    if mode == 'manual':
-                        # Manual mode - single Pokémon rolls
-                        r = random.random()
-                        if r < 0.6:
-                            pool = data.get('common', [])
-                        elif r < 0.9:
-                            pool = data.get('uncommon', [])
-                        elif r < 0.99:
-                            pool = data.get('rare', [])
-                        else:
-                            pool = data.get('vrare', [])
-                        
-                        if not pool:
-                            continue
-                        
-                        poke_name = random.choice(pool)
-                        
-                        # Shiny check
-                        shiny = random.random() < 0.002
-                        
-                        lvl = random.randint(*data['level_range'])
-                        nature = random.choice(["Adamant","Modest","Timid","Jolly","Bold","Calm","Impish","Lax","Relaxed","Sassy","Gentle","Hasty","Naive","Naughty","Rash","Brave","Quiet","Mild","Lonely","Hardy","Docile","Quirky","Serious","Bashful"])
-                        gender = "♂" if random.random() < 0.5 else "♀"
-                        
-                        # Stats calculation
-                        base_stats = pokemons.get(poke_name, {})
-                        level_stats = {k: random.randint(1, 3) * lvl // 5 for k in base_stats}
-                        nature_bonus = {k: math.floor((base_stats.get(k, 0) + level_stats.get(k,0)) * 0.1) for k in base_stats}
-                        final_stats = {k: base_stats.get(k,0) + level_stats.get(k,0) + nature_bonus.get(k,0) for k in base_stats}
-                        
-                        # HP formula
-                        hp_base = base_stats.get('HP',0)
-                        hp_levelup = level_stats.get('HP',0)
-                        hp_bonus = nature_bonus.get('HP',0)
-                        hp_total = lvl + (hp_base + hp_levelup + hp_bonus) * 3
-                        
-                        # Build result string
-                        shiny_prefix = "✨ " if shiny else ""
-                        
-                        stat_lines = [f"{k}: {base_stats.get(k,0)} / {level_stats.get(k,0)} ({'+' if nature_bonus[k]>=0 else ''}{nature_bonus[k]}) / {final_stats[k]}" for k in final_stats if k != 'HP']
-                        stat_lines.insert(0, f"Hit Points: {hp_total} HP: {hp_base} / {hp_levelup} ({'+' if hp_bonus>=0 else ''}{hp_bonus}) / {hp_total}")
-                        
-                        results.append(f"{shiny_prefix}{poke_name} Lv.{lvl} — {nature} — {gender}<br>" + "<br>".join(stat_lines))
-                    
-                    else:  # mode == 'auto'
-                        # Auto mode: need team levels for severity calculation
-                        team_levels = []
-                        for i in range(1, 7):
-                            level_str = request.form.get(f'team_level_{i}')
-                            if level_str and level_str.strip():
-                                try:
-                                    team_levels.append(int(level_str))
-                                except ValueError:
-                                    continue
-                        
-                        if not team_levels:
-                            message = "Please enter at least one team member level for auto mode!"
-                            conn.close()
-                            return render_template('encounters.html', tables=tables, message=message, results=results, pokemons=list(pokemons.keys()), mode=mode)
-                        
-                        # Roll weighted severity
-                        severities, weights = zip(*severity_weights)
-                        sev = random.choices(severities, weights=weights, k=1)[0]
-                        
-                        weakest = min(team_levels)
-                        strongest = max(team_levels)
-                        
-                        # CORRECTED: Determine number of Pokémon and level based on severity
-                        if sev == 1:
-                            num_pokemon, base_level = 1, weakest
-                            level_desc = f"equal to weakest ({weakest})"
-                        elif sev == 2:
-                            num_pokemon, base_level = 1, weakest + 1
-                            level_desc = f"+1 above weakest ({weakest} → {weakest+1})"
-                        elif sev == 3:
-                            num_pokemon, base_level = 2, weakest + 2
-                            level_desc = f"+2 above weakest ({weakest} → {weakest+2})"
-                        elif sev == 4:
-                            num_pokemon, base_level = 2, (weakest + strongest) // 2
-                            level_desc = f"midpoint between {weakest} and {strongest} ({weakest+strongest})/2 = {(weakest+strongest)//2}"
-                        elif sev == 5:
-                            num_pokemon, base_level = 3, strongest
-                            level_desc = f"equal to strongest ({strongest})"
-                        elif sev == 6:
-                            num_pokemon, base_level = 3, strongest + 1
-                            level_desc = f"+1 above strongest ({strongest} → {strongest+1})"
-                        elif sev == 7:
-                            num_pokemon, base_level = 4, strongest + 2
-                            level_desc = f"+2 above strongest ({strongest} → {strongest+2})"
-                        elif sev == 8:
-                            num_pokemon, base_level = 5, strongest + 3
-                            level_desc = f"+3 above strongest ({strongest} → {strongest+3})"
-                        elif sev == 9:
-                            num_pokemon, base_level = 6, strongest + 4
-                            level_desc = f"+4 above strongest ({strongest} → {strongest+4})"
-                        else:  # sev == 10
-                            num_pokemon, base_level = 6, strongest + 5
-                            level_desc = f"+5 above strongest ({strongest} → {strongest+5})"
-                        
-                        # Ensure level doesn't go below 1
-                        base_level = max(1, base_level)
-                        
-                        # Add evolution info for higher severities
-                        extra_info = ""
-                        if sev == 9:
-                            extra_info = " (1 Pokémon will be evolved)"
-                        elif sev == 10:
-                            extra_info = f" ({random.randint(1,2)} Pokémon will be evolved)"
-                        
-                        # Add header for this encounter - only once per roll
-                        header_added = False
-                        encounter_results = []
-                        
-                        # Generate multiple Pokémon for this encounter
-                        for pokemon_num in range(num_pokemon):
-                            # Decide if this Pokémon should be evolved (for severity 9/10)
-                            is_evolved = False
-                            if sev == 9 and pokemon_num == 0:  # First Pokémon evolved
-                                is_evolved = True
-                            elif sev == 10 and pokemon_num < random.randint(1, 2):  # 1-2 Pokémon evolved
-                                is_evolved = True
-                            
-                            # Shiny check (1/500)
-                            shiny = random.random() < 0.002
-                            
-                            # Roll for Pokémon from table
-                            r = random.random()
-                            if r < 0.6:
-                                pool = data.get('common', [])
-                            elif r < 0.9:
-                                pool = data.get('uncommon', [])
-                            elif r < 0.99:
-                                pool = data.get('rare', [])
-                            else:
-                                pool = data.get('vrare', [])
-                            
-                            if not pool:
-                                continue
-                            
-                            poke_name = random.choice(pool)
-                            
-                            # If evolved, try to find evolved form (simplified logic)
-                            if is_evolved:
-                                evolved_forms = {
-                                    "Charmander": "Charmeleon", "Charmeleon": "Charizard",
-                                    "Squirtle": "Wartortle", "Wartortle": "Blastoise",
-                                    "Bulbasaur": "Ivysaur", "Ivysaur": "Venusaur",
-                                    "Caterpie": "Metapod", "Metapod": "Butterfree",
-                                    "Weedle": "Kakuna", "Kakuna": "Beedrill",
-                                    "Pidgey": "Pidgeotto", "Pidgeotto": "Pidgeot",
-                                    "Rattata": "Raticate", "Spearow": "Fearow",
-                                    "Ekans": "Arbok", "Pikachu": "Raichu",
-                                    "Sandshrew": "Sandslash", "Nidoran♀": "Nidorina",
-                                    "Nidoran♂": "Nidorino", "Clefairy": "Clefable",
-                                    "Vulpix": "Ninetales", "Jigglypuff": "Wigglytuff",
-                                    "Zubat": "Golbat", "Oddish": "Gloom",
-                                    "Paras": "Parasect", "Venonat": "Venomoth",
-                                    "Diglett": "Dugtrio", "Meowth": "Persian",
-                                    "Psyduck": "Golduck", "Mankey": "Primeape",
-                                    "Growlithe": "Arcanine", "Poliwag": "Poliwhirl",
-                                    "Abra": "Kadabra", "Machop": "Machoke",
-                                    "Bellsprout": "Weepinbell", "Tentacool": "Tentacruel",
-                                    "Geodude": "Graveler", "Ponyta": "Rapidash",
-                                    "Slowpoke": "Slowbro", "Magnemite": "Magneton",
-                                    "Doduo": "Dodrio", "Seel": "Dewgong",
-                                    "Grimer": "Muk", "Shellder": "Cloyster",
-                                    "Gastly": "Haunter", "Onix": "Steelix",
-                                    "Drowzee": "Hypno", "Krabby": "Kingler",
-                                    "Voltorb": "Electrode", "Exeggcute": "Exeggutor",
-                                    "Cubone": "Marowak", "Koffing": "Weezing",
-                                    "Rhyhorn": "Rhydon", "Horsea": "Seadra",
-                                    "Goldeen": "Seaking", "Staryu": "Starmie",
-                                    "Magikarp": "Gyarados", "Eevee": ["Vaporeon", "Jolteon", "Flareon"]
-                                }
-                                
-                                if poke_name in evolved_forms:
-                                    evolved_name = evolved_forms[poke_name]
-                                    if isinstance(evolved_name, list):
-                                        evolved_name = random.choice(evolved_name)
-                                    if evolved_name in pokemons:
-                                        poke_name = evolved_name
-                            
-                            lvl = base_level
-                            
-                            # Rest of the generation logic...
-                            nature = random.choice(["Adamant","Modest","Timid","Jolly","Bold","Calm","Impish","Lax","Relaxed","Sassy","Gentle","Hasty","Naive","Naughty","Rash","Brave","Quiet","Mild","Lonely","Hardy","Docile","Quirky","Serious","Bashful"])
-                            gender = "♂" if random.random() < 0.5 else "♀"
-                            
-                            # Stats calculation
-                            base_stats = pokemons.get(poke_name, {})
-                            level_stats = {k: random.randint(1, 3) * lvl // 5 for k in base_stats}
-                            nature_bonus = {k: math.floor((base_stats.get(k, 0) + level_stats.get(k,0)) * 0.1) for k in base_stats}
-                            final_stats = {k: base_stats.get(k,0) + level_stats.get(k,0) + nature_bonus.get(k,0) for k in base_stats}
-                            
-                            # HP formula
-                            hp_base = base_stats.get('HP',0)
-                            hp_levelup = level_stats.get('HP',0)
-                            hp_bonus = nature_bonus.get('HP',0)
-                            hp_total = lvl + (hp_base + hp_levelup + hp_bonus) * 3
-                            
-                            # Build result string
-                            shiny_prefix = "✨ " if shiny else ""
-                            evolved_prefix = "⚡ " if is_evolved else ""
-                            
-                            stat_lines = [f"{k}: {base_stats.get(k,0)} / {level_stats.get(k,0)} ({'+' if nature_bonus[k]>=0 else ''}{nature_bonus[k]}) / {final_stats[k]}" for k in final_stats if k != 'HP']
-                            stat_lines.insert(0, f"Hit Points: {hp_total} HP: {hp_base} / {hp_levelup} ({'+' if hp_bonus>=0 else ''}{hp_bonus}) / {hp_total}")
-                            
-                            encounter_results.append(f"{evolved_prefix}{shiny_prefix}{poke_name} Lv.{lvl} — {nature} — {gender}<br>" + "<br>".join(stat_lines))
-                        
-                        # Add header and all Pokémon results to main results
-                        results.append(f"<div class='alert alert-info'><strong>Encounter {roll_num+1} (Severity {sev}): {num_pokemon} Pokémon</strong><br>Level: {base_level} — {level_desc}{extra_info}</div>")
-                        results.extend(encounter_results)
+            try:
+                sampler = encounter_engine.get_sampler(conn, table_name)
+                if sampler:
+                    num_rolls = int(request.form.get('num_rolls', 1))
+                    team_levels = team_levels_from_form(request.form) if mode != 'manual' else []
+                    seed = seeds.parse(request.form.get('seed'))
+                    # Lazy: the page streams encounters as they are rolled
+                    results = encounter_rolls.roll(seed, sampler, pokemons, num_rolls, mode, team_levels)
+                    # Everything needed to replay this session later
+                    session = {
+                        'seed': seed,
+                        'table_name': table_name,
+                        'table_version': sampler.version,
+                        'mode': mode,
+                        'party': encounter_rolls.format_party(team_levels),
+                        'n': num_rolls,
+                    }
+                    events.hub.publish(events.encounter_channel(table_name), 'rolled', session)
+            except ValueError as e:
+                message = str(e)
+    
+    return stream_template('encounters.html', tables=tables, message=message, results=results, mode=mode,
+                           session=session)
+
+def team_levels_from_form(form):
+    """Party levels from the team_level_1..6 fields, blanks skipped."""
+    team_levels = []
+    for i in range(1, 7):
+        level_str = form.get(f'team_level_{i}')
+        if level_str and level_str.strip():
+            try:
+                team_levels.append(int(level_str))
+            except ValueError:
+                continue
+    return team_levels
+
+@app.route('/api/encounters/<table_name>/roll')
+def roll_encounters(table_name):
+    """Encounters as NDJSON, one line per roll as it is made, e.g.
+    /api/encounters/Route 1/roll?n=500&party=12,14,18&mode=auto&seed=42
+
+    The seed and table version used are returned in the X-Roll-Seed and
+    X-Table-Version headers.
+    """
+    conn = get_db()
+    try:
+        sampler = encounter_engine.get_sampler(conn, table_name)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    if not sampler:
+        return jsonify({'error': f"Table '{table_name}' not found"}), 404
+    
+    try:
+        n = int(request.args.get('n', 1))
+        party = [int(p) for p in request.args.get('party', '').split(',') if p.strip()]
+        mode = request.args.get('mode', 'auto' if party else 'manual')
+        seed = seeds.parse(request.args.get('seed'))
+        rolls = encounter_rolls.roll(seed, sampler, catalog.get_catalog(conn), n, mode, party)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    def generate():
+        for encounter in rolls:
+            yield json.dumps(encounter_rolls.to_dict(encounter), ensure_ascii=False) + '\n'
+    
+    headers = {'X-Roll-Seed': str(seed), 'X-Table-Version': str(sampler.version)}
+    return Response(generate(), mimetype='application/x-ndjson', headers=headers)
+
+@app.route('/api/encounters/<table_name>/events')
+def encounter_events(table_name):
+    """Server-Sent Events for a GM encounter board: 'table' (saved, with
+    its new version), 'deleted', 'rolled' (the replayable roll session)
+    and 'saved' (an encounter kept from a roll).
+    """
+    row = get_db().execute("SELECT version FROM encounters WHERE table_name=?", (table_name,)).fetchone()
+    return event_stream(events.encounter_channel(table_name),
+                        ('ready', {'table_name': table_name, 'version': row['version'] if row else None}))
+
+def event_stream(channel, first):
+    if not events.hub.accepting():
+        return jsonify({'error': "Too many open event streams"}), 503
+    return Response(events.stream(channel, first), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no',  # don't let a proxy hold events back
+    })
+
+@app.route('/api/encounters/<table_name>/simulate')
+def simulate_encounters(table_name):
+    """Monte Carlo histograms for a table, e.g.
+    /api/encounters/Route 1/simulate?n=1000000&party=12,14,18&mode=auto
+    """
+    conn = get_db()
+    try:
+        sampler = encounter_engine.get_sampler(conn, table_name)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    if not sampler:
+        return jsonify({'error': f"Table '{table_name}' not found"}), 404
     
-    conn.close()
-    return render_template('encounters.html', tables=tables, message=message, results=results, pokemons=list(pokemons.keys()), mode=mode)
+    try:
+        n = int(request.args.get('n', 10000))
+        party = [int(p) for p in request.args.get('party', '').split(',') if p.strip()]
+        seed = request.args.get('seed', type=int)
+        mode = request.args.get('mode', 'auto' if party else 'manual')
+        result = encounter_sim.simulate(sampler, catalog.get_catalog(conn), n,
+                                        party_levels=party, mode=mode, seed=seed)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify(result)
 
 @app.route('/edit_move/<name>', methods=['GET', 'POST'])
 def edit_move(name):
@@ -501,13 +455,8 @@ def edit_move(name):
         # Convert empty AC to None (for DB)
         ac = int(ac) if ac and ac.strip().isdigit() else None
         
-        c.execute("""
-            UPDATE moves 
-            SET ac = ?, damage = ?, effect = ? 
-            WHERE name = ?
-        """, (ac, damage, effect, name))
+        move_store.update_move(conn, name, ac, damage, effect)
         conn.commit()
-        conn.close()
         
         flash(f"Move '{name}' updated successfully!", "success")
         return redirect(url_for('moves'))
@@ -515,7 +464,6 @@ def edit_move(name):
     # GET: show edit form
     c.execute("SELECT * FROM moves WHERE name = ?", (name,))
     move = c.fetchone()
-    conn.close()
     
     if not move:
         flash("Move not found", "error")
@@ -523,31 +471,29 @@ def edit_move(name):
     
     return render_template('edit_move.html', move=move)
 
+def stats_from_form(form):
+    """Typed stat columns from the insert/edit Pokémon form fields."""
+    fields = {'HP': 'hp', 'Atk': 'atk', 'Def': 'defense', 'SpA': 'spa', 'SpD': 'spd', 'Spe': 'spe'}
+    return {col: form.get(field, 0) for col, field in fields.items()}
+
 @app.route('/edit_pokemon/<name>', methods=['GET', 'POST'])
 def edit_pokemon(name):
     conn = get_db()
     c = conn.cursor()
     
     if request.method == 'POST':
-        hp = int(request.form.get('hp', 0))
-        atk = int(request.form.get('atk', 0))
-        defense = int(request.form.get('defense', 0))
-        spa = int(request.form.get('spa', 0))
-        spd = int(request.form.get('spd', 0))
-        spe = int(request.form.get('spe', 0))
+        try:
+            stats = species_stats.validate(stats_from_form(request.form))
+        except ValueError as e:
+            flash(str(e), "error")
+            return redirect(url_for('edit_pokemon', name=name))
+        hp, atk, defense, spa, spd, spe = (stats[col] for col in species_stats.STAT_COLUMNS)
         capabilities = request.form.get('capabilities', '')
         skills = request.form.get('skills', '')
         abilities = request.form.get('abilities', '')
         
-        # Update stats JSON
-        stats_json = json.dumps({
-            "HP": hp,
-            "Attack": atk,
-            "Defense": defense,
-            "Special Attack": spa,
-            "Special Defense": spd,
-            "Speed": spe
-        })
+        # Legacy stats JSON, kept in sync with the typed columns
+        stats_json = species_stats.to_json(stats)
         
         c.execute("""
             UPDATE pokemon 
@@ -557,7 +503,6 @@ def edit_pokemon(name):
         """, (hp, atk, defense, spa, spd, spe, 
               capabilities, skills, abilities, stats_json, name))
         conn.commit()
-        conn.close()
         
         flash(f"Pokémon '{name}' updated successfully!", "success")
         return redirect(url_for('pokemon'))
@@ -565,7 +510,6 @@ def edit_pokemon(name):
     # GET: Show edit form
     c.execute("SELECT * FROM pokemon WHERE name = ?", (name,))
     pokemon = c.fetchone()
-    conn.close()
     
     if not pokemon:
         flash("Pokémon not found", "error")
@@ -577,12 +521,6 @@ def edit_pokemon(name):
 def insert_pokemon():
     if request.method == 'POST':
         name = request.form.get('name', '').strip()
-        hp = int(request.form.get('hp', 0))
-        atk = int(request.form.get('atk', 0))
-        defense = int(request.form.get('defense', 0))
-        spa = int(request.form.get('spa', 0))
-        spd = int(request.form.get('spd', 0))
-        spe = int(request.form.get('spe', 0))
         capabilities = request.form.get('capabilities', '')
         skills = request.form.get('skills', '')
         abilities = request.form.get('abilities', '')
@@ -591,15 +529,15 @@ def insert_pokemon():
             flash("Pokémon name is required", "error")
             return render_template('insert_pokemon.html')
         
-        # Create stats JSON
-        stats_json = json.dumps({
-            "HP": hp,
-            "Attack": atk,
-            "Defense": defense,
-            "Special Attack": spa,
-            "Special Defense": spd,
-            "Speed": spe
-        })
+        try:
+            stats = species_stats.validate(stats_from_form(request.form))
+        except ValueError as e:
+            flash(str(e), "error")
+            return render_template('insert_pokemon.html')
+        hp, atk, defense, spa, spd, spe = (stats[col] for col in species_stats.STAT_COLUMNS)
+        
+        # Legacy stats JSON, kept in sync with the typed columns
+        stats_json = species_stats.to_json(stats)
         
         conn = get_db()
         c = conn.cursor()
@@ -617,8 +555,6 @@ def insert_pokemon():
             return redirect(url_for('pokemon'))
         except sqlite3.IntegrityError:
             flash(f"Pokémon '{name}' already exists!", "error")
-        finally:
-            conn.close()
     
     return render_template('insert_pokemon.html')
 
@@ -647,24 +583,21 @@ def import_pokemon_csv():
         
         imported = 0
         for row in csv_input:
-            if len(row) < 6:  # Skip header or malformed rows
+            if len(row) < 7:  # Skip header or malformed rows
                 continue
             
-            name, hp, atk, defense, spa, spd, spe = row[0], row[1], row[2], row[3], row[4], row[5], row[6]
+            name = row[0].strip()
             
             # Skip header row if it contains column names
             if name.lower() == 'name':
                 continue
             
-            # Create stats JSON
-            stats_json = json.dumps({
-                "HP": int(hp),
-                "Attack": int(atk),
-                "Defense": int(defense),
-                "Special Attack": int(spa),
-                "Special Defense": int(spd),
-                "Speed": int(spe)
-            })
+            try:
+                stats = species_stats.validate(dict(zip(species_stats.STAT_COLUMNS, row[1:7])))
+            except ValueError as e:
+                raise ValueError(f"{name}: {e}")
+            hp, atk, defense, spa, spd, spe = (stats[col] for col in species_stats.STAT_COLUMNS)
+            stats_json = species_stats.to_json(stats)
             
             # Insert or update
             c.execute("""
@@ -675,7 +608,6 @@ def import_pokemon_csv():
             imported += 1
         
         conn.commit()
-        conn.close()
         
         flash(f"Successfully imported {imported} Pokémon!", "success")
         
@@ -690,66 +622,52 @@ def pokemon_generator():
     conn = get_db()
     c = conn.cursor()
     
-    # Get all Pokémon names
-    c.execute("SELECT name FROM pokemon ORDER BY name")
-    pokemon_names = [row['name'] for row in c.fetchall()]
+    # Species lookups go through the shared catalog; the page itself only
+    # fetches names from /api/species/suggest
+    species_catalog = catalog.get_catalog(conn)
     
     # Get all natures
-    natures = ["Adamant","Modest","Timid","Jolly","Bold","Calm","Impish","Lax","Relaxed",
-              "Sassy","Gentle","Hasty","Naive","Naughty","Rash","Brave","Quiet","Mild",
-              "Lonely","Hardy","Docile","Quirky","Serious","Bashful"]
+    natures = species_stats.NATURES
     
     result = None
     if request.method == 'POST':
+        try:
+            seed = seeds.parse(request.form.get('seed'))
+        except ValueError as e:
+            flash(str(e), "error")
+            return render_template('pokemon_generator.html', natures=natures)
+        rng = seeds.rng(seed)
         poke_name = request.form.get('pokemon_name')
         level = int(request.form.get('level', 5))
         nature = request.form.get('nature', 'random')
         gender_select = request.form.get('gender', 'random')
         
         # Get base stats
-        c.execute("SELECT stats FROM pokemon WHERE name = ?", (poke_name,))
-        row = c.fetchone()
+        species = species_catalog.get(poke_name)
         
-        if not row:
+        if not species:
             flash("Pokémon not found!", "error")
-            conn.close()
-            return render_template('pokemon_generator.html', pokemon_names=pokemon_names, natures=natures)
-        
-        # Parse stats
-        stats_str = row['stats']
-        if stats_str:
-            try:
-                base_stats = json.loads(stats_str)
-            except json.JSONDecodeError:
-                base_stats = {}
-        else:
-            base_stats = {}
+            return render_template('pokemon_generator.html', natures=natures)
         
         # Determine nature
         if nature == 'random':
-            chosen_nature = random.choice(natures)
+            chosen_nature = rng.choice(natures)
         else:
             chosen_nature = nature
         
         # Determine gender
         if gender_select == 'random':
-            gender = "♂" if random.random() < 0.5 else "♀"
+            gender = "♂" if rng.random() < 0.5 else "♀"
         else:
             gender = gender_select
         
         # Shiny check (1/500)
-        shiny = random.random() < 0.002
+        shiny = rng.random() < 0.002
         
-        # Calculate stats
-        level_stats = {k: random.randint(1, 3) * level // 5 for k in base_stats}
-        nature_bonus = {k: math.floor((base_stats.get(k, 0) + level_stats.get(k,0)) * 0.1) for k in base_stats}
-        final_stats = {k: base_stats.get(k,0) + level_stats.get(k,0) + nature_bonus.get(k,0) for k in base_stats}
-        
-        # HP formula
-        hp_base = base_stats.get('HP',0)
-        hp_levelup = level_stats.get('HP',0)
-        hp_bonus = nature_bonus.get('HP',0)
-        hp_total = level + (hp_base + hp_levelup + hp_bonus) * 3
+        # Calculate stats (same kernel as the encounter rolls)
+        blocks = stat_blocks.roll(seeds.numpy_rng(seed), species_catalog.base_stats([species.name]), [level])
+        base_stats, level_stats, nature_bonus, final_stats = stat_blocks.labelled(blocks, 0)
+        hp_total = int(blocks.hit_points[0])
         
         # Build result
         shiny_prefix = "✨ " if shiny else ""
@@ -764,87 +682,71 @@ def pokemon_generator():
             'base_stats': base_stats,
             'level_stats': level_stats,
             'nature_bonus': nature_bonus,
-            'final_stats': final_stats
+            'final_stats': final_stats,
+            'seed': seed,
         }
     
-    conn.close()
-    return render_template('pokemon_generator.html', pokemon_names=pokemon_names, natures=natures, result=result)
+    return render_template('pokemon_generator.html', natures=natures, result=result)
 
 @app.route('/generate_random_pokemon')
 def generate_random_pokemon():
-    conn = get_db()
-    c = conn.cursor()
+    # Pick from the cached catalog rather than ORDER BY RANDOM()
+    names = catalog.get_catalog(get_db()).names
     
-    # Get random Pokémon
-    c.execute("SELECT name FROM pokemon ORDER BY RANDOM() LIMIT 1")
-    pokemon = c.fetchone()
-    
-    if not pokemon:
-        conn.close()
+    if not names:
         return redirect(url_for('pokemon_generator'))
     
-    conn.close()
-    return redirect(url_for('pokemon_generator') + f"?pokemon={pokemon['name']}")
+    return redirect(url_for('pokemon_generator', pokemon=seeds.rng(seeds.new_seed()).choice(names)))
+
+@app.route('/api/generate', methods=['POST'])
+def generate_horde():
+    """Whole hordes or NPC parties in one request; see horde.py for the
+    body.  Add ?format=csv (or "format": "csv") for a CSV download.
+    """
+    body = request.get_json(silent=True)
+    if not isinstance(body, dict):
+        return jsonify({'error': 'Expected a JSON object with a "groups" list'}), 400
+    
+    try:
+        seed = seeds.parse(body.get('seed'))
+        rows = horde.generate(catalog.get_catalog(get_db()), body.get('groups'), seed)
+    except (TypeError, ValueError) as e:
+        return jsonify({'error': str(e)}), 400
+    
+    if request.args.get('format', body.get('format')) == 'csv':
+        return Response(horde.to_csv(rows), mimetype='text/csv', headers={
+            'Content-Disposition': f'attachment; filename=horde-{seed}.csv',
+            'X-Roll-Seed': str(seed),
+        })
+    return jsonify({
+        'seed': seed,
+        'count': len(rows),
+        'pokemon': [dict(encounter_rolls.pokemon_dict(p), group=number) for number, p in rows],
+    })
+
+@app.route('/api/species/suggest')
+def species_suggest():
+    query = request.args.get('q', '')
+    limit = min(max(request.args.get('limit', 10, type=int), 1), 50)
+    return jsonify(catalog.get_catalog(get_db()).suggest(query, limit))
 
 # ==================== TRAINER SHEETS ====================
 @app.route('/trainer_sheets', methods=['GET', 'POST'])
 def trainer_sheets():
     conn = get_db()
-    c = conn.cursor()
-    
-    # Create tables if they don't exist
-    c.execute('''CREATE TABLE IF NOT EXISTS trainers
-                 (id INTEGER PRIMARY KEY AUTOINCREMENT,
-                  name TEXT NOT NULL,
-                  created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP)''')
-    
-    c.execute('''CREATE TABLE IF NOT EXISTS trainer_inventory
-                 (id INTEGER PRIMARY KEY AUTOINCREMENT,
-                  trainer_id INTEGER,
-                  item_name TEXT,
-                  quantity INTEGER DEFAULT 1,
-                  FOREIGN KEY (trainer_id) REFERENCES trainers (id))''')
-    
-    c.execute('''CREATE TABLE IF NOT EXISTS trainer_pokemon
-                 (id INTEGER PRIMARY KEY AUTOINCREMENT,
-                  trainer_id INTEGER,
-                  pokemon_name TEXT,
-                  nickname TEXT,
-                  level INTEGER DEFAULT 5,
-                  nature TEXT,
-                  gender TEXT,
-                  is_shiny BOOLEAN DEFAULT 0,
-                  is_active BOOLEAN DEFAULT 1,
-                  FOREIGN KEY (trainer_id) REFERENCES trainers (id))''')
-    
-    conn.commit()
-    
-    # Get all trainers
-    c.execute("SELECT * FROM trainers ORDER BY created_at DESC")
-    trainers = c.fetchall()
-    
-    selected_trainer = None
-    inventory = []
-    active_pokemon = []
-    pc_pokemon = []
     
     # Handle GET request (select trainer) - also check POST for trainer_id
     trainer_id = request.args.get('trainer_id') or (request.form.get('trainer_id') if request.method == 'POST' else None)
-    if trainer_id:
-        c.execute("SELECT * FROM trainers WHERE id = ?", (trainer_id,))
-        selected_trainer = c.fetchone()
-    
     
     # Handle POST requests
     if request.method == 'POST':
         action = request.form.get('action')
+        selected_trainer = trainer_store.get_trainer(conn, trainer_id) if trainer_id else None
         
         if action == 'create_trainer':
             trainer_name = request.form.get('trainer_name', '').strip()
             if trainer_name:
-                c.execute("INSERT INTO trainers (name) VALUES (?)", (trainer_name,))
-                conn.commit()
-                trainer_id = c.lastrowid
+                trainer_id = trainer_store.create_trainer(conn, trainer_name)
                 flash(f"Trainer '{trainer_name}' created!", "success")
                 return redirect(url_for('trainer_sheets') + f"?trainer_id={trainer_id}")
         
@@ -853,18 +755,7 @@ def trainer_sheets():
             quantity = int(request.form.get('quantity', 1))
             
             if item_name:
-                # Check if item already exists
-                c.execute("SELECT * FROM trainer_inventory WHERE trainer_id = ? AND item_name = ?", 
-                         (selected_trainer['id'], item_name))
-                existing = c.fetchone()
-                
-                if existing:
-                    c.execute("UPDATE trainer_inventory SET quantity = quantity + ? WHERE id = ?", 
-                             (quantity, existing['id']))
-                else:
-                    c.execute("INSERT INTO trainer_inventory (trainer_id, item_name, quantity) VALUES (?, ?, ?)",
-                             (selected_trainer['id'], item_name, quantity))
-                conn.commit()
+                trainer_store.add_item(conn, selected_trainer['id'], item_name, quantity)
                 flash(f"Added {quantity}x {item_name} to inventory!", "success")
                 return redirect(url_for('trainer_sheets') + f"?trainer_id={selected_trainer['id']}")
         
@@ -876,141 +767,212 @@ def trainer_sheets():
             gender = request.form.get('gender', '♂')
             is_shiny = request.form.get('is_shiny') == 'yes'
             is_active = request.form.get('is_active') == 'active'
+            try:
+                growth_rate = exp_tables.growth_rate(request.form.get('growth_rate'))
+                exp = exp_tables.exp_for_level(growth_rate, level)
+            except ValueError as e:
+                flash(str(e), "error")
+                return redirect(url_for('trainer_sheets') + f"?trainer_id={selected_trainer['id']}")
+            
+            if pokemon_name and pokemon_name not in catalog.get_catalog(conn):
+                flash(f"Unknown Pokémon '{pokemon_name}'", "error")
+                return redirect(url_for('trainer_sheets') + f"?trainer_id={selected_trainer['id']}")
             
             if pokemon_name:
-                c.execute("""INSERT INTO trainer_pokemon 
-                          (trainer_id, pokemon_name, nickname, level, nature, gender, is_shiny, is_active)
-                          VALUES (?, ?, ?, ?, ?, ?, ?, ?)""",
-                         (selected_trainer['id'], pokemon_name, nickname, level, nature, gender, is_shiny, is_active))
-                conn.commit()
-                flash(f"Added {pokemon_name} to trainer!", "success")
+                # Rolled once here and kept; level-ups only add to it
+                stats, = trainer_stats.roll(seeds.numpy_rng(seeds.new_seed()), catalog.get_catalog(conn),
+                                            [pokemon_name], [level])
+                _, in_party = trainer_store.add_pokemon(conn, selected_trainer['id'], pokemon_name, nickname, level,
+                                                        nature, gender, is_shiny, is_active, exp, growth_rate, stats)
+                if is_active and not in_party:
+                    flash(f"Party is full, so {pokemon_name} was sent to the PC.", "error")
+                else:
+                    flash(f"Added {pokemon_name} to trainer!", "success")
                 return redirect(url_for('trainer_sheets') + f"?trainer_id={selected_trainer['id']}")
         
         elif action == 'move_to_pc' and selected_trainer:
-            pokemon_id = request.form.get('pokemon_id')
+            pokemon_id = request.form.get('pokemon_id', type=int)
             if pokemon_id:
-                c.execute("UPDATE trainer_pokemon SET is_active = 0 WHERE id = ?", (pokemon_id,))
-                conn.commit()
-                flash("Pokémon moved to PC!", "success")
+                try:
+                    trainer_store.move_to_pc(conn, selected_trainer['id'], pokemon_id,
+                                             request.form.get('version', type=int))
+                    flash("Pokémon moved to PC!", "success")
+                except (LookupError, trainer_store.Conflict) as e:
+                    flash(str(e), "error")
                 return redirect(url_for('trainer_sheets') + f"?trainer_id={selected_trainer['id']}")
         
         elif action == 'move_to_party' and selected_trainer:
-            pokemon_id = request.form.get('pokemon_id')
+            pokemon_id = request.form.get('pokemon_id', type=int)
             if pokemon_id:
-                # Check if party is full (max 6)
-                c.execute("SELECT COUNT(*) FROM trainer_pokemon WHERE trainer_id = ? AND is_active = 1", 
-                         (selected_trainer['id'],))
-                count = c.fetchone()[0]
-                
-                if count < 6:
-                    c.execute("UPDATE trainer_pokemon SET is_active = 1 WHERE id = ?", (pokemon_id,))
-                    conn.commit()
-                    flash("Pokémon moved to party!", "success")
-                else:
-                    flash("Party is full (max 6 Pokémon)!", "error")
+                try:
+                    if trainer_store.move_to_party(conn, selected_trainer['id'], pokemon_id,
+                                                   request.form.get('version', type=int)):
+                        flash("Pokémon moved to party!", "success")
+                    else:
+                        flash(f"Party is full (max {trainer_store.PARTY_SIZE} Pokémon)!", "error")
+                except (LookupError, trainer_store.Conflict) as e:
+                    flash(str(e), "error")
                 return redirect(url_for('trainer_sheets') + f"?trainer_id={selected_trainer['id']}")
     
     # Get trainer data if a trainer is selected
-    if selected_trainer:
-        # Get inventory
-        c.execute("SELECT * FROM trainer_inventory WHERE trainer_id = ? ORDER BY item_name", (selected_trainer['id'],))
-        inventory = c.fetchall()
-        
-        # Get Pokémon
-        c.execute("SELECT * FROM trainer_pokemon WHERE trainer_id = ? ORDER BY is_active DESC, pokemon_name", (selected_trainer['id'],))
-        all_pokemon = c.fetchall()
-        
-        # Separate active and PC
-        for pkmn in all_pokemon:
-            if pkmn['is_active']:
-                active_pokemon.append(pkmn)
-            else:
-                pc_pokemon.append(pkmn)
-    
-    conn.close()
-    
-    # Get Pokémon names for dropdown
-    conn = get_db()
-    c = conn.cursor()
-    c.execute("SELECT name FROM pokemon ORDER BY name")
-    pokemon_names = [row['name'] for row in c.fetchall()]
-    conn.close()
+    sheet = trainer_store.load_sheet(conn, trainer_id) if trainer_id else None
+    selected_trainer, inventory, active_pokemon, pc_pokemon = sheet or (None, [], [], [])
     
-    natures = ["Adamant","Modest","Timid","Jolly","Bold","Calm","Impish","Lax","Relaxed",
-              "Sassy","Gentle","Hasty","Naive","Naughty","Rash","Brave","Quiet","Mild",
-              "Lonely","Hardy","Docile","Quirky","Serious","Bashful"]
+    natures = species_stats.NATURES
     
     return render_template('trainer_sheets.html', 
-                          trainers=trainers,
+                          trainers=trainer_store.list_trainers(conn),
                           selected_trainer=selected_trainer,
                           inventory=inventory,
                           active_pokemon=active_pokemon,
                           pc_pokemon=pc_pokemon,
-                          pokemon_names=pokemon_names,
-                          natures=natures)
+                          natures=natures,
+                          growth_rates=exp_tables.GROWTH_RATES)
 
-@app.route('/delete_trainer/<int:trainer_id>')
-def delete_trainer(trainer_id):
+@app.route('/api/battles/settle', methods=['POST'])
+def settle_battle():
+    """Share a battle's EXP among trainer Pokémon and apply level-ups:
+    {"defeated": [{"species": "Zubat", "level": 12, "base_exp": 49}],
+     "participants": [3, 7, 8], "split": true}
+    """
+    body = request.get_json(silent=True)
+    if not isinstance(body, dict):
+        return jsonify({'error': 'Expected a JSON object with "defeated" and "participants" lists'}), 400
+    try:
+        results = settlement.settle(get_db(), body.get('defeated'), body.get('participants'),
+                                    split=body.get('split', True))
+    except (TypeError, ValueError) as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify({'results': results})
+
+@app.route('/api/trainers/<int:trainer_id>/batch', methods=['POST'])
+def trainer_batch(trainer_id):
+    """Apply several sheet edits at once and return the new sheet:
+    {"version": 3,
+     "operations": [{"op": "move_to_party", "pokemon_id": 12, "version": 2},
+                    {"op": "move_to_pc", "pokemon_id": 4},
+                    {"op": "add_item", "item_name": "Potion", "quantity": -2},
+                    {"op": "set_item", "item_id": 7, "quantity": 5},
+                    {"op": "delete_item", "item_id": 9},
+                    {"op": "delete_pokemon", "pokemon_id": 30}]}
+    All or nothing: one bad operation (or a party over six) writes nothing.
+    The optional versions are the trainer's and each row's as last read;
+    if any has moved on the response is a 409 with the current sheet.
+    """
     conn = get_db()
-    c = conn.cursor()
-    
-    # Delete trainer and all related data
-    c.execute("DELETE FROM trainer_inventory WHERE trainer_id = ?", (trainer_id,))
-    c.execute("DELETE FROM trainer_pokemon WHERE trainer_id = ?", (trainer_id,))
-    c.execute("DELETE FROM trainers WHERE id = ?", (trainer_id,))
+    body = request.get_json(silent=True)
+    if not isinstance(body, dict):
+        return jsonify({'error': 'Expected a JSON object with an "operations" list'}), 400
+    try:
+        sheet = trainer_store.apply_batch(conn, trainer_id, body.get('operations'), body.get('version'))
+    except trainer_store.Conflict as e:
+        current = trainer_store.load_sheet(conn, trainer_id)
+        return jsonify({'error': str(e), 'sheet': trainer_store.sheet_dict(current)}), 409
+    except LookupError as e:
+        return jsonify({'error': str(e)}), 404
+    except (TypeError, ValueError) as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify(trainer_store.sheet_dict(sheet))
+
+@app.route('/api/trainers/<int:trainer_id>/events')
+def trainer_events(trainer_id):
+    """Server-Sent Events for one trainer sheet.  'pokemon' and 'inventory'
+    carry {"changed": [rows], "removed": [ids]}; 'trainer' a new sheet
+    version; 'deleted' the trainer going away; 'resync' asks for a reload.
+    """
+    trainer = trainer_store.get_trainer(get_db(), trainer_id)
+    if trainer is None:
+        return jsonify({'error': f"Trainer {trainer_id} not found"}), 404
+    return event_stream(events.trainer_channel(trainer_id),
+                        ('ready', {'trainer_id': trainer_id, 'version': trainer['version']}))
+
+@app.route('/api/trainers/export')
+def export_trainers():
+    """Gzip'd JSON-lines snapshot of every trainer, or of ?ids=1,4,7."""
+    try:
+        ids = [int(i) for i in request.args.get('ids', '').split(',') if i.strip()] or None
+    except ValueError:
+        return jsonify({'error': "ids must be a comma-separated list of trainer ids"}), 400
     
-    conn.commit()
-    conn.close()
+    def generate():
+        # The response outlives the request's connection, so borrow one
+        conn = db.pool.acquire()
+        try:
+            yield from trainer_snapshot.dump(conn, ids)
+        finally:
+            db.pool.release(conn)
     
-    flash("Trainer deleted!", "success")
-    return redirect(url_for('trainer_sheets'))
+    return Response(generate(), mimetype='application/gzip', headers={
+        'Content-Disposition': 'attachment; filename=trainers.jsonl.gz',
+    })
 
-@app.route('/delete_pokemon/<int:pokemon_id>')
-def delete_pokemon(pokemon_id):
+@app.route('/api/trainers/import', methods=['POST'])
+def import_trainers_api():
+    """Load an /api/trainers/export body (sent as-is) as new trainers."""
     conn = get_db()
-    c = conn.cursor()
+    try:
+        imported = trainer_snapshot.load(conn, request.stream, catalog.get_catalog(conn))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify({'imported': [{'id': trainer_id, 'name': name} for trainer_id, name in imported]})
+
+@app.route('/import_trainers', methods=['POST'])
+def import_trainers():
+    file = request.files.get('export_file')
+    if not file or file.filename == '':
+        flash('No file selected', 'error')
+        return redirect(url_for('trainer_sheets'))
     
-    # Get trainer ID for redirect
-    c.execute("SELECT trainer_id FROM trainer_pokemon WHERE id = ?", (pokemon_id,))
-    result = c.fetchone()
+    conn = get_db()
+    try:
+        imported = trainer_snapshot.load(conn, file.stream, catalog.get_catalog(conn))
+    except ValueError as e:
+        flash(f"Error importing trainers: {e}", "error")
+        return redirect(url_for('trainer_sheets'))
     
-    if result:
-        trainer_id = result['trainer_id']
-        c.execute("DELETE FROM trainer_pokemon WHERE id = ?", (pokemon_id,))
-        conn.commit()
-        flash("Pokémon deleted!", "success")
-        conn.close()
+    flash(f"Imported {len(imported)} trainer(s)!", "success")
+    return redirect(url_for('trainer_sheets'))
+
+@app.route('/delete_trainer/<int:trainer_id>')
+def delete_trainer(trainer_id):
+    # Delete trainer and all related data
+    try:
+        trainer_store.delete_trainer(get_db(), trainer_id, request.args.get('version', type=int))
+    except trainer_store.Conflict as e:
+        flash(str(e), "error")
         return redirect(url_for('trainer_sheets') + f"?trainer_id={trainer_id}")
+    except LookupError as e:
+        flash(str(e), "error")
+        return redirect(url_for('trainer_sheets'))
     
-    conn.close()
+    flash("Trainer deleted!", "success")
     return redirect(url_for('trainer_sheets'))
 
+@app.route('/delete_pokemon/<int:pokemon_id>')
+def delete_pokemon(pokemon_id):
+    try:
+        trainer_id = trainer_store.delete_pokemon(get_db(), pokemon_id, request.args.get('version', type=int))
+    except (LookupError, trainer_store.Conflict) as e:
+        flash(str(e), "error")
+        return redirect(url_for('trainer_sheets', trainer_id=request.args.get('trainer_id')))
+    
+    flash("Pokémon deleted!", "success")
+    return redirect(url_for('trainer_sheets') + f"?trainer_id={trainer_id}")
+
 @app.route('/update_inventory/<int:item_id>', methods=['POST'])
 def update_inventory(item_id):
     new_quantity = int(request.form.get('quantity', 1))
     
-    conn = get_db()
-    c = conn.cursor()
-    
-    # Get trainer ID for redirect
-    c.execute("SELECT trainer_id FROM trainer_inventory WHERE id = ?", (item_id,))
-    result = c.fetchone()
-    
-    if result:
-        trainer_id = result['trainer_id']
-        
-        if new_quantity <= 0:
-            c.execute("DELETE FROM trainer_inventory WHERE id = ?", (item_id,))
-        else:
-            c.execute("UPDATE trainer_inventory SET quantity = ? WHERE id = ?", (new_quantity, item_id))
-        
-        conn.commit()
-        flash("Inventory updated!", "success")
-        conn.close()
-        return redirect(url_for('trainer_sheets') + f"?trainer_id={trainer_id}")
+    # Zero or less removes the entry
+    try:
+        trainer_id = trainer_store.set_item_quantity(get_db(), item_id, new_quantity,
+                                                     request.form.get('version', type=int))
+    except (LookupError, trainer_store.Conflict) as e:
+        flash(str(e), "error")
+        return redirect(url_for('trainer_sheets', trainer_id=request.form.get('trainer_id')))
     
-    conn.close()
-    return redirect(url_for('trainer_sheets'))  
+    flash("Inventory updated!", "success")
+    return redirect(url_for('trainer_sheets') + f"?trainer_id={trainer_id}")  
   
 @app.route('/insert_move', methods=['GET', 'POST'])
 def insert_move():
@@ -1028,11 +990,9 @@ def insert_move():
         ac_value = int(ac) if ac and ac.isdigit() else None
         
         conn = get_db()
-        c = conn.cursor()
         
         try:
-            c.execute("INSERT INTO moves (name, ac, damage, effect) VALUES (?, ?, ?, ?)",
-                     (name, ac_value, damage, effect))
+            move_store.insert_move(conn, name, ac_value, damage, effect)
             conn.commit()
             flash(f"Move '{name}' added successfully!", "success")
             return redirect(url_for('moves'))
@@ -1040,8 +1000,6 @@ def insert_move():
             flash(f"Move '{name}' already exists!", "error")
         except Exception as e:
             flash(f"Error adding move: {str(e)}", "error")
-        finally:
-            conn.close()
     
     return render_template('insert_move.html')
 
@@ -1051,21 +1009,44 @@ def insert_move():
 def save_encounter():
     conn = get_db()
     c = conn.cursor()
-    
-    # Create table for saved encounters if it doesn't exist
-    c.execute('''CREATE TABLE IF NOT EXISTS saved_encounters
-                 (id INTEGER PRIMARY KEY AUTOINCREMENT,
-                  encounter_text TEXT,
-                  saved_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP)''')
-    
-    encounter_text = request.form.get('encounter_text')
-    
-    if encounter_text:
-        c.execute("INSERT INTO saved_encounters (encounter_text) VALUES (?)", (encounter_text,))
+
+    form = request.form
+    if form.get('seed'):
+        # Only the roll session is stored; the encounter is re-rolled from it
+        try:
+            saved = {
+                'seed': int(form['seed']),
+                'table_name': form['table_name'],
+                'table_version': int(form['table_version']),
+                'mode': form['mode'],
+                'party': form.get('party', ''),
+                'n': int(form['n']),
+                'encounter_number': int(form['encounter_number']),
+                'pokemon_index': int(form['pokemon_index']),
+            }
+            encounter = encounter_rolls.replay(conn, catalog.get_catalog(conn), saved)
+        except (KeyError, ValueError):
+            return jsonify({'error': 'Incomplete roll session'}), 400
+        saved['replay_digest'] = encounter_rolls.fingerprint(encounter) if encounter else None
+        c.execute("""INSERT INTO saved_encounters
+                  (seed, table_name, table_version, mode, party, n, encounter_number, pokemon_index,
+                   replay_digest)
+                  VALUES (:seed, :table_name, :table_version, :mode, :party, :n, :encounter_number,
+                          :pokemon_index, :replay_digest)""", saved)
+        conn.commit()
+        events.hub.publish(events.encounter_channel(saved['table_name']), 'saved', {
+            'id': c.lastrowid,
+            'table_name': saved['table_name'],
+            'seed': saved['seed'],
+            'encounter_number': saved['encounter_number'],
+            'pokemon_index': saved['pokemon_index'],
+        })
+        flash("Encounter saved successfully!", "success")
+    elif form.get('encounter_text'):
+        c.execute("INSERT INTO saved_encounters (encounter_text) VALUES (?)", (form['encounter_text'],))
         conn.commit()
         flash("Encounter saved successfully!", "success")
     
-    conn.close()
     return redirect(url_for('encounters'))
 
 @app.route('/delete_saved_encounter/<int:encounter_id>')
@@ -1077,25 +1058,42 @@ def delete_saved_encounter(encounter_id):
     conn.commit()
     
     flash("Saved encounter deleted!", "success")
-    conn.close()
     return redirect(url_for('view_saved_encounters'))
 
 @app.route('/saved_encounters')
 def view_saved_encounters():
     conn = get_db()
     c = conn.cursor()
+    size = listing.page_size(request.args.get('page_size'))
+    before = request.args.get('before', type=int)
+
+    # Newest first, keyset-paged on (saved_at, id)
+    if before is None:
+        c.execute("SELECT * FROM saved_encounters ORDER BY saved_at DESC, id DESC LIMIT ?", (size + 1,))
+    else:
+        c.execute("""SELECT * FROM saved_encounters
+                     WHERE (saved_at, id) < (SELECT saved_at, id FROM saved_encounters WHERE id = ?)
+                     ORDER BY saved_at DESC, id DESC LIMIT ?""", (before, size + 1))
+    rows = c.fetchall()
+    next_before = rows[size - 1]['id'] if len(rows) > size else None
+
+    species_catalog = catalog.get_catalog(conn)
+    saved_encounters = []
+    for row in rows[:size]:
+        pokemon = None
+        changed = False
+        if row['seed'] is not None:
+            try:
+                encounter = encounter_rolls.replay(conn, species_catalog, row)
+            except ValueError:
+                encounter = None
+            if encounter and 0 <= row['pokemon_index'] < len(encounter.pokemon):
+                pokemon = encounter.pokemon[row['pokemon_index']]
+                changed = bool(row['replay_digest']) and encounter_rolls.fingerprint(encounter) != row['replay_digest']
+        saved_encounters.append({'row': row, 'pokemon': pokemon, 'changed': changed})
     
-    # Create table if it doesn't exist
-    c.execute('''CREATE TABLE IF NOT EXISTS saved_encounters
-                 (id INTEGER PRIMARY KEY AUTOINCREMENT,
-                  encounter_text TEXT,
-                  saved_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP)''')
-    
-    c.execute("SELECT * FROM saved_encounters ORDER BY saved_at DESC")
-    saved_encounters = c.fetchall()
-    
-    conn.close()
-    return render_template('saved_encounters.html', saved_encounters=saved_encounters)
+    return render_template('saved_encounters.html', saved_encounters=saved_encounters,
+                           next_before=next_before, page_size=size)
     
 
 if __name__ == '__main__':
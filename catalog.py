@@ -0,0 +1,168 @@
+import bisect
+import json
+import re
+import threading
+import unicodedata
+from collections import namedtuple
+from types import MappingProxyType
+
+import numpy as np
+
+import evolutions
+import species_stats
+
+# Read-mostly species data shared by the roll/generator routes.  The
+# catalog object is never mutated: triggers on the pokemon and evolutions
+# tables bump the generation stored in catalog_generation, and the next
+# reader in any worker process builds a fresh catalog and swaps it in.
+
+Species = namedtuple('Species', ['name', 'stats', 'abilities'])
+
+_lock = threading.Lock()
+_current = None
+
+
+class SpeciesCatalog:
+    __slots__ = ('generation', 'names', 'evolutions', '_by_name', '_rows', '_stat_matrix',
+                 '_prefix_keys', '_prefix_names')
+
+    def __init__(self, generation, species, evolution_index=None):
+        self.generation = generation
+        self.names = tuple(s.name for s in species)
+        self.evolutions = evolution_index or evolutions.EvolutionIndex(())
+        by_name = {}
+        for s in species:
+            by_name[s.name] = s
+            # Older rows can still carry TOC dots; accept the cleaned name too
+            by_name.setdefault(clean_name(s.name), s)
+        self._by_name = MappingProxyType(by_name)
+
+        # Base stats as one (n + 1, 6) array for the batched stat kernel;
+        # the extra last row is all zeros for names not in the catalog.
+        rows = {s.name: i for i, s in enumerate(species)}
+        for i, s in enumerate(species):
+            rows.setdefault(clean_name(s.name), i)
+        self._rows = MappingProxyType(rows)
+        matrix = np.zeros((len(species) + 1, len(species_stats.STAT_COLUMNS)), dtype=np.int64)
+        for i, s in enumerate(species):
+            matrix[i] = [s.stats[species_stats.STAT_LABELS[col]] for col in species_stats.STAT_COLUMNS]
+        matrix.flags.writeable = False
+        self._stat_matrix = matrix
+
+        # Prefix index: one sorted entry per word start of the folded name,
+        # so "dig" finds both "Diglett" and "Alolan Diglett".  Rank 0 marks
+        # a match at the start of the full name.
+        entries = []
+        for name in self.names:
+            words = fold(name).split()
+            for i in range(len(words)):
+                entries.append((' '.join(words[i:]), min(i, 1), name))
+        entries.sort()
+        self._prefix_keys = tuple(e[0] for e in entries)
+        self._prefix_names = tuple((e[1], e[2]) for e in entries)
+
+    def __contains__(self, name):
+        return name in self._by_name
+
+    def __len__(self):
+        return len(self.names)
+
+    def get(self, name):
+        return self._by_name.get(name)
+
+    def stats(self, name):
+        species = self._by_name.get(name)
+        return species.stats if species else MappingProxyType({})
+
+    def base_stats(self, names):
+        """(len(names), 6) base stat array in STAT_COLUMNS order."""
+        missing = len(self._stat_matrix) - 1
+        return self._stat_matrix[[self._rows.get(name, missing) for name in names]]
+
+    def suggest(self, query, limit=10):
+        """Species whose name (or any word of it) starts with `query`."""
+        prefix = fold(query)
+        if not prefix:
+            return []
+        keys = self._prefix_keys
+        start = bisect.bisect_left(keys, prefix)
+        # Every key starting with prefix sorts below prefix + U+10FFFF
+        end = bisect.bisect_left(keys, prefix + '\U0010ffff', lo=start)
+        matches = sorted(self._prefix_names[start:end])
+        seen = set()
+        results = []
+        for _rank, name in matches:
+            if name not in seen:
+                seen.add(name)
+                results.append(name)
+                if len(results) >= limit:
+                    break
+        return results
+
+
+def clean_name(name):
+    return name.replace('.', '').strip()
+
+
+_GENDER_SIGNS = {'♀': ' f', '♂': ' m'}
+_NON_WORD = re.compile(r"[^0-9a-z]+")
+
+
+def fold(text):
+    """Case- and accent-insensitive search key.
+
+    "Flabébé" -> "flabebe", "Nidoran♀" -> "nidoran f", "Farfetch'd" ->
+    "farfetchd", "Mr. Mime" -> "mr mime".
+    """
+    for sign, letter in _GENDER_SIGNS.items():
+        text = text.replace(sign, letter)
+    text = unicodedata.normalize('NFKD', text)
+    text = ''.join(ch for ch in text if not unicodedata.combining(ch))
+    text = text.casefold().replace("'", '').replace('’', '')
+    return ' '.join(_NON_WORD.sub(' ', text).split())
+
+
+def _parse_json(text, default):
+    if not text:
+        return default
+    try:
+        return json.loads(text)
+    except json.JSONDecodeError:
+        return default
+
+
+def build(conn, generation):
+    species = []
+    cols = ', '.join(species_stats.STAT_COLUMNS)
+    for row in conn.execute(f"SELECT name, {cols}, abilities FROM pokemon ORDER BY name"):
+        abilities = _parse_json(row['abilities'], [])
+        species.append(Species(
+            row['name'],
+            MappingProxyType(species_stats.labelled(row)),
+            tuple(abilities) if isinstance(abilities, list) else (),
+        ))
+    index = evolutions.build_index(conn, {s.name for s in species})
+    return SpeciesCatalog(generation, species, index)
+
+
+def generation(conn):
+    """The species data's generation, bumped by every write to it."""
+    return conn.execute("SELECT generation FROM catalog_generation").fetchone()[0]
+
+
+def get_catalog(conn):
+    """Current catalog, rebuilt from `conn` if the species data changed."""
+    global _current
+    current_generation = generation(conn)
+    with _lock:
+        current = _current
+    if current is not None and current.generation == current_generation:
+        return current
+
+    # A write landing mid-build leaves the stored generation ahead of
+    # ours, so the next reader rebuilds again
+    catalog = build(conn, current_generation)
+    with _lock:
+        if _current is None or _current.generation < current_generation:
+            _current = catalog
+    return catalog
@@ -0,0 +1,17 @@
+import os
+
+# SQLite database used by the web app
+DATABASE = os.environ.get('PTE_DATABASE', 'database.db')
+
+# Pokédex text dump the evolution graph is parsed from
+POKEDEX_TEXT = os.environ.get('PTE_POKEDEX_TEXT', 'pte_pdf_full.txt')
+
+# Connection tuning (applied once per pooled connection)
+SQLITE_BUSY_TIMEOUT_MS = 5000
+SQLITE_MMAP_SIZE = 64 * 1024 * 1024
+SQLITE_CACHED_STATEMENTS = 256
+SQLITE_POOL_SIZE = 8
+
+# Species/move list pages
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
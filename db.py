@@ -0,0 +1,79 @@
+import sqlite3
+import queue
+import threading
+
+from flask import g
+
+import config
+
+
+def connect(path=None):
+    """Open a connection and apply the pragmas we want on every handle."""
+    conn = sqlite3.connect(path or config.DATABASE,
+                           timeout=config.SQLITE_BUSY_TIMEOUT_MS / 1000,
+                           cached_statements=config.SQLITE_CACHED_STATEMENTS,
+                           check_same_thread=False)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute(f"PRAGMA busy_timeout={int(config.SQLITE_BUSY_TIMEOUT_MS)}")
+    conn.execute(f"PRAGMA mmap_size={int(config.SQLITE_MMAP_SIZE)}")
+    return conn
+
+
+class ConnectionPool:
+    """Keeps configured connections alive between requests.
+
+    A connection is only ever used by one thread at a time: it is taken
+    out of the pool for the duration of an app context and put back on
+    teardown, so its statement cache stays warm across requests.
+    """
+
+    def __init__(self, path=None, size=None):
+        self.path = path
+        self.size = size or config.SQLITE_POOL_SIZE
+        self._idle = queue.LifoQueue()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            return connect(self.path)
+
+    def release(self, conn):
+        # Never hand a half-finished transaction to the next request
+        if conn.in_transaction:
+            conn.rollback()
+        with self._lock:
+            if self._idle.qsize() < self.size:
+                self._idle.put_nowait(conn)
+                return
+        conn.close()
+
+    def close_all(self):
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                break
+
+
+pool = ConnectionPool()
+
+
+def get_db():
+    """Connection bound to the current app context (one per request)."""
+    if 'db' not in g:
+        g.db = pool.acquire()
+    return g.db
+
+
+def _release_db(exc=None):
+    conn = g.pop('db', None)
+    if conn is not None:
+        pool.release(conn)
+
+
+def init_app(app):
+    app.teardown_appcontext(_release_db)
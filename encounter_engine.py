@@ -0,0 +1,218 @@
+import json
+import threading
+
+from species_stats import NATURES
+
+# Encounter tables are stored as JSON in `encounters.data`.  Rolling one
+# used to re-decode that JSON and walk if/elif chains for every Pokémon;
+# here each table is compiled once into a sampler (alias tables for the
+# rarity tier, precomputed level range) and cached until the table's
+# stored version changes.  Every save also keeps the table's JSON under a
+# new version number, so saved encounters can replay against the exact
+# table they were rolled from.
+
+TIERS = ('common', 'uncommon', 'rare', 'vrare')
+TIER_WEIGHTS = (0.60, 0.30, 0.09, 0.01)
+
+# Auto mode severity weights (severity, chance)
+SEVERITY_WEIGHTS = (
+    (1, 0.30), (2, 0.20), (3, 0.15), (4, 0.10), (5, 0.07),
+    (6, 0.06), (7, 0.05), (8, 0.03), (9, 0.02), (10, 0.02),
+)
+
+SHINY_CHANCE = 0.002
+
+
+class AliasTable:
+    """Walker/Vose alias table: O(1) sampling from a fixed distribution."""
+
+    __slots__ = ('n', 'prob', 'alias')
+
+    def __init__(self, weights):
+        n = len(weights)
+        total = float(sum(weights))
+        if n == 0 or total <= 0:
+            raise ValueError("alias table needs at least one positive weight")
+        scaled = [w * n / total for w in weights]
+        small = [i for i, p in enumerate(scaled) if p < 1.0]
+        large = [i for i, p in enumerate(scaled) if p >= 1.0]
+        prob = [1.0] * n
+        alias = list(range(n))
+        while small and large:
+            s = small.pop()
+            l = large.pop()
+            prob[s] = scaled[s]
+            alias[s] = l
+            scaled[l] = scaled[l] + scaled[s] - 1.0
+            (small if scaled[l] < 1.0 else large).append(l)
+        # Leftovers are 1.0 up to float rounding
+        self.n = n
+        self.prob = tuple(prob)
+        self.alias = tuple(alias)
+
+    def sample(self, rng):
+        u = rng.random() * self.n
+        i = int(u)
+        return i if u - i < self.prob[i] else self.alias[i]
+
+
+TIER_TABLE = AliasTable(TIER_WEIGHTS)
+SEVERITY_TABLE = AliasTable([w for _, w in SEVERITY_WEIGHTS])
+
+
+class EncounterSampler:
+    """One compiled encounter table."""
+
+    __slots__ = ('name', 'version', 'level_min', 'level_max', 'pools')
+
+    def __init__(self, name, data, version=None):
+        self.name = name
+        self.version = version
+        lo, hi = (int(v) for v in data['level_range'])
+        self.level_min, self.level_max = min(lo, hi), max(lo, hi)
+        self.pools = tuple(tuple(data.get(tier) or ()) for tier in TIERS)
+
+    def roll_species(self, rng):
+        """Species for one slot, or None when the rolled tier is empty."""
+        pool = self.pools[TIER_TABLE.sample(rng)]
+        if not pool:
+            return None
+        return pool[int(rng.random() * len(pool))]
+
+    def roll_level(self, rng):
+        return self.level_min + int(rng.random() * (self.level_max - self.level_min + 1))
+
+
+def evolution_options(name, species_catalog, level=None):
+    """Evolved forms of `name` for an encounter at `level` (may be empty).
+
+    The furthest forms the species reaches by `level`; when it is below
+    every threshold (or no level is given) the next stage, since severity
+    9/10 encounters always show an evolved Pokémon.
+    """
+    index = species_catalog.evolutions
+    if level is not None:
+        forms = index.evolve_at(name, level)
+        if forms:
+            return forms
+    return tuple(dst for dst, _ in index.next_forms(name))
+
+
+def roll_nature(rng):
+    return NATURES[int(rng.random() * len(NATURES))]
+
+
+def roll_severity(rng):
+    return SEVERITY_WEIGHTS[SEVERITY_TABLE.sample(rng)][0]
+
+
+def severity_encounter(sev, weakest, strongest):
+    """(number of Pokémon, base level, level description) for a severity."""
+    if sev == 1:
+        num_pokemon, base_level = 1, weakest
+        level_desc = f"equal to weakest ({weakest})"
+    elif sev == 2:
+        num_pokemon, base_level = 1, weakest + 1
+        level_desc = f"+1 above weakest ({weakest} → {weakest+1})"
+    elif sev == 3:
+        num_pokemon, base_level = 2, weakest + 2
+        level_desc = f"+2 above weakest ({weakest} → {weakest+2})"
+    elif sev == 4:
+        num_pokemon, base_level = 2, (weakest + strongest) // 2
+        level_desc = f"midpoint between {weakest} and {strongest} ({weakest+strongest})/2 = {(weakest+strongest)//2}"
+    elif sev == 5:
+        num_pokemon, base_level = 3, strongest
+        level_desc = f"equal to strongest ({strongest})"
+    elif sev == 6:
+        num_pokemon, base_level = 3, strongest + 1
+        level_desc = f"+1 above strongest ({strongest} → {strongest+1})"
+    elif sev == 7:
+        num_pokemon, base_level = 4, strongest + 2
+        level_desc = f"+2 above strongest ({strongest} → {strongest+2})"
+    elif sev == 8:
+        num_pokemon, base_level = 5, strongest + 3
+        level_desc = f"+3 above strongest ({strongest} → {strongest+3})"
+    elif sev == 9:
+        num_pokemon, base_level = 6, strongest + 4
+        level_desc = f"+4 above strongest ({strongest} → {strongest+4})"
+    else:  # sev == 10
+        num_pokemon, base_level = 6, strongest + 5
+        level_desc = f"+5 above strongest ({strongest} → {strongest+5})"
+    # Level never goes below 1
+    return num_pokemon, max(1, base_level), level_desc
+
+
+_lock = threading.Lock()
+_samplers = {}
+
+# Old table versions never change, so their samplers need no invalidation
+_HISTORY_CACHE_SIZE = 64
+_history = {}
+
+
+def compile_table(name, raw_json, version=None):
+    """Raises ValueError if the stored table cannot be compiled."""
+    try:
+        data = json.loads(raw_json)
+        return EncounterSampler(name, data, version)
+    except (json.JSONDecodeError, KeyError, TypeError, ValueError) as e:
+        raise ValueError(f"Error loading table '{name}' data!") from e
+
+
+def get_sampler(conn, name):
+    """Compiled sampler for `name` (None if no such table).
+
+    A cached sampler is reused while its version matches the stored
+    table's, so a save or delete in any worker process is picked up.
+    """
+    row = conn.execute("SELECT version FROM encounters WHERE table_name=?", (name,)).fetchone()
+    with _lock:
+        if not row:
+            _samplers.pop(name, None)
+            return None
+        sampler = _samplers.get(name)
+    if sampler is not None and sampler.version == row['version']:
+        return sampler
+    row = conn.execute("SELECT data, version FROM encounters WHERE table_name=?", (name,)).fetchone()
+    if not row:
+        return None
+    sampler = compile_table(name, row['data'], row['version'])
+    with _lock:
+        _samplers[name] = sampler
+    return sampler
+
+
+def get_sampler_version(conn, name, table_version):
+    """Sampler for `name` as it was at `table_version` (None if unknown)."""
+    key = (name, table_version)
+    with _lock:
+        sampler = _history.get(key)
+    if sampler is not None:
+        return sampler
+    row = conn.execute(
+        "SELECT data FROM encounter_table_versions WHERE table_name=? AND version=?", key).fetchone()
+    if not row:
+        return None
+    sampler = compile_table(name, row['data'], table_version)
+    with _lock:
+        if len(_history) >= _HISTORY_CACHE_SIZE:
+            _history.pop(next(iter(_history)))
+        _history[key] = sampler
+    return sampler
+
+
+def save_table(conn, name, data):
+    """Store `data` as the next version of table `name`; returns the version.
+
+    Versions keep counting across a delete and re-create, so a saved
+    encounter never points at a different table with the same number.
+    """
+    raw = json.dumps(data)
+    version = conn.execute(
+        "SELECT COALESCE(MAX(version), 0) + 1 FROM encounter_table_versions WHERE table_name=?",
+        (name,)).fetchone()[0]
+    conn.execute("INSERT INTO encounter_table_versions (table_name, version, data) VALUES (?, ?, ?)",
+                 (name, version, raw))
+    conn.execute("INSERT OR REPLACE INTO encounters (table_name, data, version) VALUES (?, ?, ?)",
+                 (name, raw, version))
+    return version
@@ -0,0 +1,175 @@
+import hashlib
+import json
+from collections import namedtuple
+from itertools import islice
+
+import encounter_engine
+import seeds
+import stat_blocks
+
+# Structured results for the encounters page and the NDJSON roll API.
+# Rolls are produced lazily, a chunk of encounters at a time, so neither
+# the page nor the stream holds every roll in memory.  Species, levels,
+# natures and genders are drawn per Pokémon; the stat blocks for a whole
+# chunk come from one stat_blocks call.  A roll session is fully
+# determined by (seed, table version, mode, party levels, n).
+#
+# Each chunk of CHUNK_SIZE encounter numbers is drawn from generators
+# derived from (seed, chunk index), so viewing a saved encounter re-rolls
+# only its own chunk.  A saved encounter also keeps a fingerprint of the
+# encounter as saved, so a replay that no longer matches (the species or
+# evolution data it read has been edited since) is flagged.
+
+MAX_ROLLS = 100_000
+CHUNK_SIZE = 256  # encounters per batched stat roll
+
+StatLine = namedtuple('StatLine', ['stat', 'base', 'level', 'nature', 'total'])
+RolledPokemon = namedtuple('RolledPokemon', [
+    'species', 'level', 'nature', 'gender', 'shiny', 'evolved', 'hit_points', 'stats'])
+Encounter = namedtuple('Encounter', [
+    'number', 'mode', 'severity', 'level', 'level_desc', 'evolved_count', 'size', 'pokemon'])
+
+# A Pokémon before its stats are rolled
+_Draft = namedtuple('_Draft', ['species', 'level', 'nature', 'gender', 'shiny', 'evolved'])
+
+
+def draft(rng, name, lvl, shiny=False, evolved=False):
+    """Nature and gender for one Pokémon; stats come later in a batch."""
+    nature = encounter_engine.roll_nature(rng)
+    gender = "♂" if rng.random() < 0.5 else "♀"
+    return _Draft(name, lvl, nature, gender, shiny, evolved)
+
+
+def draft_manual(rng, sampler, n, start=1):
+    """One single-Pokémon encounter per roll; empty tiers yield nothing."""
+    for number in range(start, n + 1):
+        name = sampler.roll_species(rng)
+        if name is None:
+            continue
+        shiny = rng.random() < encounter_engine.SHINY_CHANCE
+        lvl = sampler.roll_level(rng)
+        yield Encounter(number, 'manual', None, lvl, None, 0, 1, (draft(rng, name, lvl, shiny),))
+
+
+def draft_auto(rng, sampler, species_catalog, n, team_levels, start=1):
+    """Severity-weighted encounters sized and levelled from the party."""
+    weakest, strongest = min(team_levels), max(team_levels)
+    for number in range(start, n + 1):
+        sev = encounter_engine.roll_severity(rng)
+        size, base_level, level_desc = encounter_engine.severity_encounter(sev, weakest, strongest)
+
+        evolved_count = 0
+        if sev == 9:
+            evolved_count = 1
+        elif sev == 10:
+            evolved_count = rng.randint(1, 2)
+
+        pokemon = []
+        for pokemon_num in range(size):
+            # Severity 9: first Pokémon evolved; 10: the first one or two
+            is_evolved = pokemon_num < evolved_count
+            shiny = rng.random() < encounter_engine.SHINY_CHANCE
+            name = sampler.roll_species(rng)
+            if name is None:
+                continue
+            if is_evolved:
+                evolved_names = encounter_engine.evolution_options(name, species_catalog, base_level)
+                if evolved_names:
+                    name = rng.choice(evolved_names)
+            pokemon.append(draft(rng, name, base_level, shiny, is_evolved))
+
+        yield Encounter(number, 'auto', sev, base_level, level_desc, evolved_count, size, tuple(pokemon))
+
+
+def roll_stats(stat_rng, species_catalog, pokemon):
+    """RolledPokemon for a list of drafts, from one stat_blocks call."""
+    blocks = stat_blocks.roll(stat_rng,
+                              species_catalog.base_stats([p.species for p in pokemon]),
+                              [p.level for p in pokemon])
+    base, gain, bonus, total = (part.tolist() for part in blocks[:4])
+    hit_points = blocks.hit_points.tolist()
+
+    rolled = []
+    for i, p in enumerate(pokemon):
+        if p.species in species_catalog:
+            stats = tuple(StatLine(*line) for line in zip(stat_blocks.LABELS, base[i], gain[i], bonus[i], total[i]))
+            rolled.append(RolledPokemon(*p, hit_points[i], stats))
+        else:
+            rolled.append(RolledPokemon(*p, p.level, ()))
+    return rolled
+
+
+def finish(stat_rng, species_catalog, drafts):
+    """Roll stat blocks for every drafted Pokémon in `drafts` at once."""
+    rolled = roll_stats(stat_rng, species_catalog, [p for encounter in drafts for p in encounter.pokemon])
+    it = iter(rolled)
+    for encounter in drafts:
+        yield encounter._replace(pokemon=tuple(islice(it, len(encounter.pokemon))))
+
+
+def _validate(n, mode, team_levels):
+    if not 1 <= n <= MAX_ROLLS:
+        raise ValueError(f"Number of rolls must be between 1 and {MAX_ROLLS}")
+    if mode == 'auto' and not team_levels:
+        raise ValueError("Please enter at least one team member level for auto mode!")
+
+
+def _chunk(seed, sampler, species_catalog, n, mode, team_levels, index):
+    """Finished encounters numbered index * CHUNK_SIZE + 1 onwards."""
+    start = index * CHUNK_SIZE + 1
+    stop = min(n, start + CHUNK_SIZE - 1)
+    rng = seeds.chunk_rng(seed, index)
+    if mode == 'auto':
+        drafts = draft_auto(rng, sampler, species_catalog, stop, team_levels, start)
+    else:
+        drafts = draft_manual(rng, sampler, stop, start)
+    return finish(seeds.chunk_numpy_rng(seed, index), species_catalog, list(drafts))
+
+
+def roll(seed, sampler, species_catalog, n, mode='manual', team_levels=()):
+    """Lazy sequence of Encounter records for `n` rolls from `seed`."""
+    _validate(n, mode, team_levels)
+    return (encounter for index in range((n + CHUNK_SIZE - 1) // CHUNK_SIZE)
+            for encounter in _chunk(seed, sampler, species_catalog, n, mode, team_levels, index))
+
+
+def pokemon_dict(pokemon):
+    """JSON-ready form of a RolledPokemon."""
+    return dict(pokemon._asdict(), stats=[s._asdict() for s in pokemon.stats])
+
+
+def to_dict(encounter):
+    """JSON-ready form of an Encounter."""
+    data = encounter._asdict()
+    data['pokemon'] = [pokemon_dict(p) for p in encounter.pokemon]
+    return data
+
+
+def parse_party(text):
+    """Party levels from "12,14,18" (blank entries skipped)."""
+    return [int(p) for p in (text or '').split(',') if p.strip()]
+
+
+def format_party(levels):
+    return ','.join(str(int(lvl)) for lvl in levels)
+
+
+def fingerprint(encounter):
+    """Digest of everything an encounter shows, to spot a changed replay."""
+    data = json.dumps(to_dict(encounter), sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(data.encode()).hexdigest()
+
+
+def replay(conn, species_catalog, saved):
+    """Re-roll the encounter a saved_encounters row points at, from its
+    chunk alone.  None when the table version is gone or the session never
+    reached that encounter.
+    """
+    sampler = encounter_engine.get_sampler_version(conn, saved['table_name'], saved['table_version'])
+    if sampler is None or not 1 <= saved['encounter_number'] <= saved['n']:
+        return None
+    team_levels = parse_party(saved['party'])
+    _validate(saved['n'], saved['mode'], team_levels)
+    index = (saved['encounter_number'] - 1) // CHUNK_SIZE
+    chunk = _chunk(saved['seed'], sampler, species_catalog, saved['n'], saved['mode'], team_levels, index)
+    return next((e for e in chunk if e.number == saved['encounter_number']), None)
@@ -0,0 +1,185 @@
+import numpy as np
+
+import encounter_engine
+import seeds
+from encounter_engine import SEVERITY_WEIGHTS, SHINY_CHANCE, TIER_WEIGHTS
+
+# Monte Carlo check of an encounter table.  Rolls the same manual and auto
+# (severity) logic as the encounters page, but in NumPy batches, and only
+# returns aggregate histograms.
+
+MAX_SIMULATIONS = 5_000_000
+BATCH_SIZE = 250_000
+
+
+class _Pools:
+    """Flat species index over a sampler's tiers, plus evolution options."""
+
+    def __init__(self, sampler, species_catalog):
+        self.names = []
+        self._index = {}
+        name_id = self._name_id
+
+        flat = []
+        self.tier_offset = np.zeros(len(sampler.pools), dtype=np.int64)
+        self.tier_size = np.zeros(len(sampler.pools), dtype=np.int64)
+        for t, pool in enumerate(sampler.pools):
+            self.tier_offset[t] = len(flat)
+            self.tier_size[t] = len(pool)
+            flat.extend(name_id(name) for name in pool)
+        self.flat = np.array(flat, dtype=np.int64)
+
+        self._species_catalog = species_catalog
+        self._evolutions = {}
+
+    def _name_id(self, name):
+        if name not in self._index:
+            self._index[name] = len(self.names)
+            self.names.append(name)
+        return self._index[name]
+
+    def roll(self, rng, size):
+        """Species ids for `size` slots; -1 where the rolled tier is empty."""
+        tiers = rng.choice(len(TIER_WEIGHTS), size=size, p=TIER_WEIGHTS)
+        sizes = self.tier_size[tiers]
+        picks = np.full(size, -1, dtype=np.int64)
+        filled = sizes > 0
+        if filled.any():
+            offsets = self.tier_offset[tiers[filled]]
+            within = (rng.random(int(filled.sum())) * sizes[filled]).astype(np.int64)
+            picks[filled] = self.flat[offsets + within]
+        return picks
+
+    def _evolution_table(self, level):
+        """Evolution candidates per species id at `level`, CSR-style."""
+        table = self._evolutions.get(level)
+        if table is None:
+            options = [encounter_engine.evolution_options(name, self._species_catalog, level)
+                       for name in list(self.names)]
+            counts = [len(o) for o in options]
+            table = (np.array(counts, dtype=np.int64),
+                     np.cumsum([0] + counts[:-1], dtype=np.int64),
+                     np.array([self._name_id(n) for o in options for n in o], dtype=np.int64))
+            self._evolutions[level] = table
+        return table
+
+    def evolve(self, rng, species, level):
+        """Evolved ids for `species` (unchanged where there is no option)."""
+        evo_count, evo_offset, evo_target = self._evolution_table(level)
+        counts = evo_count[species]
+        can = counts > 0
+        out = species.copy()
+        if can.any():
+            choice = (rng.random(int(can.sum())) * counts[can]).astype(np.int64)
+            out[can] = evo_target[evo_offset[species[can]] + choice]
+        return out
+
+
+def _severity_tables(party_levels):
+    weakest, strongest = min(party_levels), max(party_levels)
+    sizes, levels = [], []
+    for sev, _ in SEVERITY_WEIGHTS:
+        num, level, _desc = encounter_engine.severity_encounter(sev, weakest, strongest)
+        sizes.append(num)
+        levels.append(level)
+    return np.array(sizes, dtype=np.int64), np.array(levels, dtype=np.int64)
+
+
+def simulate(sampler, species_catalog, n, party_levels=(), mode='manual', seed=None):
+    """Aggregate stats for `n` rolls (manual) or encounters (auto).
+
+    Difficulty is the total level of the Pokémon that actually spawned in
+    a roll divided by the total party level, averaged over rolls.
+    """
+    if not 1 <= n <= MAX_SIMULATIONS:
+        raise ValueError(f"n must be between 1 and {MAX_SIMULATIONS}")
+    if mode == 'auto' and not party_levels:
+        raise ValueError("auto mode needs at least one party level")
+
+    if seed is None:
+        seed = seeds.new_seed()
+    rng = np.random.default_rng(seed)
+    pools = _Pools(sampler, species_catalog)
+    party_total = sum(party_levels)
+
+    species_counts = np.zeros(0, dtype=np.int64)
+    level_counts = np.zeros(0, dtype=np.int64)
+    severity_counts = np.zeros(len(SEVERITY_WEIGHTS), dtype=np.int64)
+    slots = spawned = shiny = evolved = 0
+    difficulty_sum = 0.0
+
+    if mode == 'auto':
+        sev_sizes, sev_levels = _severity_tables(party_levels)
+        sev_p = np.array([w for _, w in SEVERITY_WEIGHTS])
+        sev_p = sev_p / sev_p.sum()
+
+    def add(hist, values):
+        counts = np.bincount(values)
+        if len(counts) > len(hist):
+            hist = np.pad(hist, (0, len(counts) - len(hist)))
+        hist[:len(counts)] += counts
+        return hist
+
+    done = 0
+    while done < n:
+        m = min(BATCH_SIZE, n - done)
+        done += m
+
+        if mode == 'auto':
+            sev_idx = rng.choice(len(sev_p), size=m, p=sev_p)
+            severity_counts += np.bincount(sev_idx, minlength=len(sev_p))
+            per_encounter = sev_sizes[sev_idx]
+            total = int(per_encounter.sum())
+            encounter = np.repeat(np.arange(m), per_encounter)
+            starts = np.cumsum(per_encounter) - per_encounter
+            position = np.arange(total) - np.repeat(starts, per_encounter)
+            # Severity 9: first Pokémon evolved.  Severity 10: the first
+            # one or two, drawn once per encounter.
+            evolved_count = np.where(sev_idx == 9, 1 + (rng.random(m) < 0.5), sev_idx == 8)
+            is_evolved = position < evolved_count[encounter]
+            levels = sev_levels[sev_idx][encounter]
+        else:
+            total = m
+            encounter = np.arange(m)
+            is_evolved = np.zeros(m, dtype=bool)
+            levels = sampler.level_min + (rng.random(m) * (sampler.level_max - sampler.level_min + 1)).astype(np.int64)
+
+        is_shiny = rng.random(total) < SHINY_CHANCE
+        species = pools.roll(rng, total)
+        present = species >= 0
+        evolve_mask = present & is_evolved
+        # Only severity 9 and 10 evolve, so this is at most two levels
+        for level in np.unique(levels[evolve_mask]):
+            mask = evolve_mask & (levels == level)
+            species[mask] = pools.evolve(rng, species[mask], int(level))
+
+        slots += total
+        spawned += int(present.sum())
+        shiny += int((is_shiny & present).sum())
+        evolved += int(evolve_mask.sum())
+        species_counts = add(species_counts, species[present])
+        level_counts = add(level_counts, levels[present])
+        if party_total:
+            level_sum = np.bincount(encounter[present], weights=levels[present], minlength=m)
+            difficulty_sum += float((level_sum / party_total).sum())
+
+    species_hist = {pools.names[i]: int(c) for i, c in enumerate(species_counts) if c}
+    result = {
+        'table': sampler.name,
+        'mode': mode,
+        'n': n,
+        'seed': seed,
+        'party': list(party_levels),
+        'slots': slots,
+        'spawned': spawned,
+        'empty_slots': slots - spawned,
+        'species': dict(sorted(species_hist.items(), key=lambda kv: -kv[1])),
+        'levels': {int(lvl): int(c) for lvl, c in enumerate(level_counts) if c},
+        'shiny_rate': shiny / spawned if spawned else 0.0,
+        'mean_difficulty': difficulty_sum / n if party_total else None,
+    }
+    if mode == 'auto':
+        result['severity'] = {sev: int(c) for (sev, _), c in zip(SEVERITY_WEIGHTS, severity_counts)}
+        result['evolved_rate'] = evolved / spawned if spawned else 0.0
+        result['mean_pokemon_per_encounter'] = spawned / n
+    return result
@@ -0,0 +1,112 @@
+import json
+import queue
+import threading
+
+# In-process pub/sub behind the Server-Sent Events endpoints.  Writers
+# publish small JSON diffs to a channel ("trainer:7", "encounters:Route 1")
+# after they commit; every open event stream on that channel gets a copy
+# on its own bounded queue.  Nothing is queried or serialised for a
+# channel nobody is watching, so read load follows actual changes rather
+# than how often players refresh.
+#
+# A subscriber that falls QUEUE_SIZE events behind is sent a single
+# "resync" event instead of the backlog, telling it to reload.
+
+QUEUE_SIZE = 256
+MAX_SUBSCRIBERS = 256
+KEEPALIVE_SECONDS = 15
+
+_RESYNC = object()
+
+
+def trainer_channel(trainer_id):
+    return f"trainer:{int(trainer_id)}"
+
+
+def encounter_channel(table_name):
+    return f"encounters:{table_name}"
+
+
+def format_event(event, data):
+    """One SSE message."""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+class Subscription:
+    def __init__(self, channel):
+        self.channel = channel
+        self.queue = queue.Queue(QUEUE_SIZE)
+
+    def put(self, event, data):
+        try:
+            self.queue.put_nowait((event, data))
+        except queue.Full:
+            # Drop the backlog; the client reloads instead
+            with self.queue.mutex:
+                self.queue.queue.clear()
+                self.queue.queue.append((_RESYNC, None))
+                self.queue.not_empty.notify()
+
+
+class Hub:
+    def __init__(self):
+        self._channels = {}
+        self._lock = threading.Lock()
+
+    def accepting(self):
+        """False once MAX_SUBSCRIBERS streams are open."""
+        with self._lock:
+            return sum(len(subs) for subs in self._channels.values()) < MAX_SUBSCRIBERS
+
+    def subscribe(self, channel):
+        """New Subscription on `channel`; raises LookupError when full."""
+        with self._lock:
+            if sum(len(subs) for subs in self._channels.values()) >= MAX_SUBSCRIBERS:
+                raise LookupError("Too many open event streams")
+            subscription = Subscription(channel)
+            self._channels.setdefault(channel, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subs = self._channels.get(subscription.channel)
+            if subs is not None:
+                subs.discard(subscription)
+                if not subs:
+                    del self._channels[subscription.channel]
+
+    def has_subscribers(self, channel):
+        return channel in self._channels
+
+    def publish(self, channel, event, data):
+        with self._lock:
+            subs = tuple(self._channels.get(channel, ()))
+        for subscription in subs:
+            subscription.put(event, data)
+
+
+hub = Hub()
+
+
+def stream(channel, first=None):
+    """SSE text chunks for `channel` until the client goes away.
+
+    `first` is an optional (event, data) sent on connect.  Subscribes on
+    the first chunk, so a response that is never sent holds nothing.
+    """
+    subscription = hub.subscribe(channel)
+    try:
+        if first is not None:
+            yield format_event(*first)
+        while True:
+            try:
+                event, data = subscription.queue.get(timeout=KEEPALIVE_SECONDS)
+            except queue.Empty:
+                yield ": keepalive\n\n"
+                continue
+            if event is _RESYNC:
+                yield format_event('resync', {})
+            else:
+                yield format_event(event, data)
+    finally:
+        hub.unsubscribe(subscription)
@@ -0,0 +1,181 @@
+import bisect
+import os
+import re
+import sqlite3
+import sys
+from collections import defaultdict
+
+import catalog
+import config
+
+# Evolution graph parsed from the Pokédex text dump.  Each species entry
+# carries a line such as
+#
+#     Fuecoco (Base) > Crocalor (15) > Skeledirge (30)
+#
+# and branching lines repeat the base with a different tail (Eevee,
+# Applin, ...).  Edges go into the `evolutions` table with the level the
+# target needs; the catalog loads them into an EvolutionIndex.
+
+_STAGE = re.compile(r"^(?P<name>.+?)\s*\((?P<level>Base|\d+)[^()]*\)$")
+_FORM_SUFFIX = re.compile(r"\s*\([^()]*\)$")
+
+
+def parse_line(line):
+    """[(name, level or None for the base), ...] or None if not a chain."""
+    line = ' '.join(line.replace('’', "'").split())
+    if '(Base)' not in line:
+        return None
+    stages = []
+    for part in line.split('>'):
+        match = _STAGE.match(part.strip())
+        if not match:
+            return None
+        level = match.group('level')
+        stages.append((match.group('name'), None if level == 'Base' else int(level)))
+    if stages[0][1] is not None or any(level is None for _, level in stages[1:]):
+        return None
+    return stages
+
+
+def parse_chains(lines):
+    """Unique (from, to, min_level) edges, names as written in the dex."""
+    edges = set()
+    for line in lines:
+        stages = parse_line(line)
+        if not stages:
+            continue
+        for (src, _), (dst, level) in zip(stages, stages[1:]):
+            edges.add((src, dst, level))
+    return edges
+
+
+def _stem(name):
+    return _FORM_SUFFIX.sub('', name)
+
+
+class _Resolver:
+    """Maps dex spellings onto `pokemon.name` values.
+
+    "Nidoran F" -> "Nidoran (F)", "Mr. Mime" -> "Mr Mime"; a bare species
+    whose rows are split by form ("Wormadam") resolves to every form.
+    """
+
+    def __init__(self, names):
+        self.exact = {}
+        self.forms = defaultdict(list)
+        for name in names:
+            self.exact.setdefault(catalog.fold(name), name)
+            stem = _stem(name)
+            if stem != name:
+                self.forms[catalog.fold(stem)].append(name)
+
+    def __call__(self, name):
+        key = catalog.fold(name)
+        if key in self.exact:
+            return [self.exact[key]]
+        stem = catalog.fold(_stem(name))
+        if stem in self.exact:
+            return [self.exact[stem]]
+        return self.forms.get(stem, [])
+
+
+def load(conn, lines):
+    """Replace the evolutions table from dex text; returns the edge count."""
+    resolve = _Resolver(row[0] for row in conn.execute("SELECT name FROM pokemon"))
+    rows = set()
+    for src, dst, level in parse_chains(lines):
+        for a in resolve(src):
+            for b in resolve(dst):
+                if a != b:
+                    rows.add((a, b, level))
+    conn.execute("DELETE FROM evolutions")
+    conn.executemany(
+        "INSERT OR REPLACE INTO evolutions (species, evolves_to, min_level) VALUES (?, ?, ?)",
+        sorted(rows))
+    return len(rows)
+
+
+def load_file(conn, path=None):
+    path = path or config.POKEDEX_TEXT
+    if not os.path.exists(path):
+        return 0
+    with open(path, encoding='utf-8', errors='replace') as f:
+        return load(conn, f)
+
+
+class EvolutionIndex:
+    """Adjacency lists plus, per species, the furthest forms by level."""
+
+    __slots__ = ('_next', '_thresholds', '_forms')
+
+    def __init__(self, edges):
+        nxt = defaultdict(list)
+        for src, dst, level in edges:
+            nxt[src].append((dst, level))
+        self._next = {src: tuple(sorted(v, key=lambda e: (e[1], e[0]))) for src, v in nxt.items()}
+
+        # For each species, the level thresholds at which its furthest
+        # reachable forms change, so evolve_at() is a dict hit and a
+        # bisect over two or three entries.
+        self._thresholds = {}
+        self._forms = {}
+        for src in self._next:
+            levels = sorted({lvl for _, lvl in self._descendants(src)})
+            self._thresholds[src] = tuple(levels)
+            self._forms[src] = tuple(self._furthest(src, lvl) for lvl in levels)
+
+    def _descendants(self, name, seen=None):
+        """(species, level needed to reach it) for everything below `name`."""
+        seen = seen if seen is not None else {name}
+        for dst, level in self._next.get(name, ()):
+            if dst in seen:
+                continue
+            seen.add(dst)
+            yield dst, level
+            for deeper, deeper_level in self._descendants(dst, seen):
+                yield deeper, max(level, deeper_level)
+
+    def _furthest(self, name, level):
+        frontier, result, seen = [name], [], {name}
+        while frontier:
+            current = frontier.pop()
+            reachable = [d for d, lvl in self._next.get(current, ()) if lvl <= level and d not in seen]
+            if not reachable and current != name:
+                result.append(current)
+            seen.update(reachable)
+            frontier.extend(reachable)
+        return tuple(sorted(result))
+
+    def __contains__(self, name):
+        return name in self._next
+
+    def next_forms(self, name):
+        """Direct evolutions of `name`, as (species, min_level) pairs."""
+        return self._next.get(name, ())
+
+    def evolve_at(self, name, level):
+        """Furthest forms `name` reaches by `level` (empty if none)."""
+        thresholds = self._thresholds.get(name)
+        if not thresholds:
+            return ()
+        i = bisect.bisect_right(thresholds, level)
+        return self._forms[name][i - 1] if i else ()
+
+
+def build_index(conn, names=None):
+    """EvolutionIndex from the table, limited to `names` when given."""
+    edges = conn.execute("SELECT species, evolves_to, min_level FROM evolutions").fetchall()
+    if names is not None:
+        edges = [e for e in edges if e[0] in names and e[1] in names]
+    return EvolutionIndex(edges)
+
+
+if __name__ == '__main__':
+    conn = sqlite3.connect(config.DATABASE)
+    try:
+        with conn:
+            count = load_file(conn, sys.argv[1] if len(sys.argv) > 1 else None)
+        print(f"Loaded {count} evolution edges")
+    finally:
+        conn.close()
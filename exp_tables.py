@@ -0,0 +1,105 @@
+import bisect
+from collections import namedtuple
+
+# EXP bookkeeping.  Totals are cumulative EXP to reach each level under
+# the five growth curves, precomputed once at import; "what level is
+# this much EXP" is a bisect over a 100-entry tuple, so a gain that
+# crosses several levels resolves in one step with the remainder carried.
+
+MAX_LEVEL = 100
+GROWTH_RATES = ('erratic', 'fast', 'medium fast', 'medium slow', 'slow')
+
+# (first level, last level, multiplier) on EXP earned, by the gainer's level
+MULTIPLIER_BANDS = {
+    "erratic": [(1, 30, 1.2), (31, 60, 1.0), (61, 100, 0.8)],
+    "fast": [(1, 30, 1.1), (31, 60, 1.1), (61, 100, 1.1)],
+    "medium fast": [(1, 30, 1.0), (31, 60, 1.0), (61, 100, 1.0)],
+    "medium slow": [(1, 30, 0.9), (31, 60, 1.0), (61, 100, 1.1)],
+    "slow": [(1, 30, 0.8), (31, 60, 0.9), (61, 100, 1.0)],
+}
+
+ExpState = namedtuple('ExpState', ['level', 'exp', 'levels_gained', 'exp_into_level', 'exp_to_next'])
+
+
+def _total(rate, n):
+    """Cumulative EXP for level n (0 at level 1)."""
+    if n <= 1:
+        return 0
+    if rate == 'fast':
+        return 4 * n ** 3 // 5
+    if rate == 'medium fast':
+        return n ** 3
+    if rate == 'medium slow':
+        return 6 * n ** 3 // 5 - 15 * n ** 2 + 100 * n - 140
+    if rate == 'slow':
+        return 5 * n ** 3 // 4
+    # erratic
+    if n < 50:
+        return n ** 3 * (100 - n) // 50
+    if n < 68:
+        return n ** 3 * (150 - n) // 100
+    if n < 98:
+        return n ** 3 * ((1911 - 10 * n) // 3) // 500
+    return n ** 3 * (160 - n) // 100
+
+
+# TOTALS[rate][level - 1] = EXP needed to reach `level`
+TOTALS = {rate: tuple(_total(rate, n) for n in range(1, MAX_LEVEL + 1)) for rate in GROWTH_RATES}
+
+# MULTIPLIERS[rate][level - 1] = multiplier for a gainer at `level`
+MULTIPLIERS = {
+    rate: tuple(next(m for lo, hi, m in bands if lo <= n <= hi) for n in range(1, MAX_LEVEL + 1))
+    for rate, bands in MULTIPLIER_BANDS.items()
+}
+
+
+def growth_rate(value):
+    rate = (value or 'medium fast').lower().strip()
+    if rate not in TOTALS:
+        raise ValueError("Invalid growth rate. Use: " + ", ".join(GROWTH_RATES))
+    return rate
+
+
+def _check_level(level):
+    if not 1 <= level <= MAX_LEVEL:
+        raise ValueError(f"Level must be between 1 and {MAX_LEVEL}")
+
+
+def exp_for_level(rate, level):
+    _check_level(level)
+    return TOTALS[rate][level - 1]
+
+
+def level_for_exp(rate, exp):
+    """Highest level whose threshold `exp` has reached."""
+    return max(1, bisect.bisect_right(TOTALS[rate], exp))
+
+
+def exp_gain(base_exp, defeated_level, rate, gaining_level):
+    """EXP earned for one defeated Pokémon: base * level / 7, scaled by
+    the gainer's growth-rate multiplier and rounded.
+    """
+    _check_level(gaining_level)
+    return round(base_exp * defeated_level / 7 * MULTIPLIERS[rate][gaining_level - 1])
+
+
+def state(rate, level, exp):
+    """ExpState for a Pokémon at `level` holding `exp` total EXP.
+
+    EXP below the level's threshold (a level set by hand) is raised to it;
+    the level never goes down.
+    """
+    _check_level(level)
+    exp = max(int(exp), TOTALS[rate][level - 1])
+    new_level = max(level, level_for_exp(rate, exp))
+    floor = TOTALS[rate][new_level - 1]
+    to_next = TOTALS[rate][new_level] - exp if new_level < MAX_LEVEL else 0
+    return ExpState(new_level, exp, new_level - level, exp - floor, to_next)
+
+
+def gain(rate, level, exp, amount):
+    """State after adding `amount` EXP; carries over any number of levels."""
+    if amount < 0:
+        raise ValueError("EXP gained cannot be negative")
+    _check_level(level)
+    return state(rate, level, max(int(exp), TOTALS[rate][level - 1]) + amount)
@@ -0,0 +1,146 @@
+import csv
+import io
+
+import encounter_engine
+import encounter_rolls
+import seeds
+import stat_blocks
+
+# Batch generation for hordes and NPC parties.  A request is a list of
+# groups, each either a fixed species or "random from a filter", with a
+# level (or level range) and a count:
+#
+#     {"seed": 42, "groups": [
+#         {"species": "Zubat", "level": [10, 14], "count": 20},
+#         {"random": {"ability": "Intimidate", "max_bst": 40}, "level": 18, "count": 2}]}
+#
+# Species come from the cached catalog and every stat block is rolled in
+# one stat_blocks call.
+
+MAX_POKEMON = 1000
+FILTER_KEYS = ('name', 'ability', 'min_bst', 'max_bst')
+
+
+def _level_range(value):
+    if isinstance(value, (list, tuple)):
+        if len(value) != 2:
+            raise ValueError("level must be a number or a [min, max] pair")
+        lo, hi = sorted(int(v) for v in value)
+    else:
+        lo = hi = int(value)
+    if lo < 1 or hi > 100:
+        raise ValueError("level must be between 1 and 100")
+    return lo, hi
+
+
+def _optional_int(filters, key):
+    value = filters.get(key)
+    if value is None:
+        return None
+    if isinstance(value, bool) or not isinstance(value, (int, str)):
+        raise ValueError(f"{key} filter must be a number")
+    try:
+        return int(value)
+    except ValueError:
+        raise ValueError(f"{key} filter must be a number") from None
+
+
+def candidates(species_catalog, filters):
+    """Species names matching a random-group filter."""
+    if not isinstance(filters, dict):
+        raise ValueError("random must be an object of filters")
+    unknown = set(filters) - set(FILTER_KEYS)
+    if unknown:
+        raise ValueError(f"Unknown filter {sorted(unknown)[0]!r}")
+    for key in ('name', 'ability'):
+        if not isinstance(filters.get(key) or '', str):
+            raise ValueError(f"{key} filter must be a string")
+    min_bst = _optional_int(filters, 'min_bst')
+    max_bst = _optional_int(filters, 'max_bst')
+    if filters.get('name'):
+        names = species_catalog.suggest(filters['name'], limit=len(species_catalog))
+    else:
+        names = species_catalog.names
+    ability = (filters.get('ability') or '').casefold()
+
+    matches = []
+    for name in names:
+        species = species_catalog.get(name)
+        if ability and ability not in (a.casefold() for a in species.abilities):
+            continue
+        bst = sum(species.stats.values())
+        if min_bst is not None and bst < min_bst:
+            continue
+        if max_bst is not None and bst > max_bst:
+            continue
+        matches.append(name)
+    return matches
+
+
+def parse_groups(species_catalog, groups):
+    """[(group index, candidate names, (lo, hi), count)], validated."""
+    if not isinstance(groups, list) or not groups:
+        raise ValueError("groups must be a non-empty list")
+    parsed = []
+    total = 0
+    for i, group in enumerate(groups):
+        if not isinstance(group, dict):
+            raise ValueError(f"group {i + 1} must be an object")
+        try:
+            count = int(group.get('count', 1))
+            levels = _level_range(group.get('level', 5))
+        except (TypeError, ValueError) as e:
+            raise ValueError(f"group {i + 1}: {e}") from e
+        if count < 1:
+            raise ValueError(f"group {i + 1}: count must be at least 1")
+        total += count
+        if total > MAX_POKEMON:
+            raise ValueError(f"At most {MAX_POKEMON} Pokémon per request")
+
+        if group.get('species'):
+            name = group['species']
+            if not isinstance(name, str):
+                raise ValueError(f"group {i + 1}: species must be a name")
+            if name not in species_catalog:
+                raise ValueError(f"group {i + 1}: unknown Pokémon '{name}'")
+            names = (species_catalog.get(name).name,)
+        else:
+            try:
+                names = candidates(species_catalog, group.get('random') or {})
+            except ValueError as e:
+                raise ValueError(f"group {i + 1}: {e}") from e
+            if not names:
+                raise ValueError(f"group {i + 1}: no Pokémon match the filter")
+        parsed.append((i + 1, names, levels, count))
+    return parsed
+
+
+def generate(species_catalog, groups, seed):
+    """[(group number, RolledPokemon)] for every Pokémon requested."""
+    rng = seeds.rng(seed)
+    numbers, drafts = [], []
+    for number, names, (lo, hi), count in parse_groups(species_catalog, groups):
+        for _ in range(count):
+            name = names[0] if len(names) == 1 else rng.choice(names)
+            shiny = rng.random() < encounter_engine.SHINY_CHANCE
+            lvl = rng.randint(lo, hi)
+            numbers.append(number)
+            drafts.append(encounter_rolls.draft(rng, name, lvl, shiny))
+    rolled = encounter_rolls.roll_stats(seeds.numpy_rng(seed), species_catalog, drafts)
+    return list(zip(numbers, rolled))
+
+
+CSV_COLUMNS = ['group', 'species', 'level', 'nature', 'gender', 'shiny', 'hit_points'] + [
+    f"{label} {part}" for label in stat_blocks.LABELS for part in ('base', 'level', 'nature', 'total')]
+
+
+def to_csv(rows):
+    out = io.StringIO()
+    writer = csv.writer(out)
+    writer.writerow(CSV_COLUMNS)
+    for number, p in rows:
+        line = [number, p.species, p.level, p.nature, p.gender, int(p.shiny), p.hit_points]
+        for s in p.stats:
+            line.extend((s.base, s.level, s.nature, s.total))
+        writer.writerow(line)
+    return out.getvalue()
@@ -0,0 +1,88 @@
+import math
+
+import numpy as np
+
+import stat_blocks
+from species_stats import NATURE_EFFECTS
+
+# Level-up stat gains.  Each level every stat gains randint(1, 2), +1 on
+# the boosted stat and -1 (never below 0) on the hindered one, so a stat
+# gains `offset + Bernoulli(1/2)` per level with offset 1 (neutral), 2
+# (boosted) or 0 (hindered).  Over k levels that is offset * k plus a
+# Binomial(k, 1/2): one binomial draw per stat samples any number of
+# levels, and the exact distribution is known in closed form.
+
+MAX_LEVELS = 100_000
+_PMF_CUTOFF = 1e-12  # drop tail probabilities below this from previews
+_EXACT_PMF_LEVELS = 1000
+
+
+def offsets(boosted=None, hindered=None):
+    """Per-level base gain for each stat, in stat_blocks.LABELS order."""
+    for label in (boosted, hindered):
+        if label is not None and label not in stat_blocks.LABELS:
+            raise ValueError(f"Unknown stat '{label}'")
+    result = np.ones(len(stat_blocks.LABELS), dtype=np.int64)
+    if boosted is not None:
+        result[stat_blocks.LABELS.index(boosted)] += 1
+    if hindered is not None:
+        result[stat_blocks.LABELS.index(hindered)] -= 1
+    return result
+
+
+def nature_offsets(nature):
+    """offsets() for a nature name; neutral or unknown natures give all 1s."""
+    return offsets(*NATURE_EFFECTS.get(nature, (None, None)))
+
+
+def _levels(levels):
+    levels = np.asarray(levels, dtype=np.int64).reshape(-1)
+    if levels.size and (levels.min() < 0 or levels.max() > MAX_LEVELS):
+        raise ValueError(f"Levels must be between 0 and {MAX_LEVELS}")
+    return levels
+
+
+def roll(rng, levels, stat_offsets):
+    """(n, 6) gains for n Pokémon levelling `levels[i]` times each.
+
+    `stat_offsets` is one offsets() row, or an (n, 6) array of them.
+    """
+    levels = _levels(levels)
+    stat_offsets = np.broadcast_to(np.asarray(stat_offsets), (len(levels), len(stat_blocks.LABELS)))
+    coin = rng.binomial(np.broadcast_to(levels[:, None], stat_offsets.shape), 0.5)
+    return stat_offsets * levels[:, None] + coin
+
+
+def distribution(levels, stat_offsets):
+    """Closed-form distribution of each stat's total gain over `levels` levels.
+
+    {label: {'min', 'max', 'mean', 'std', 'pmf': {gain: probability}}};
+    probabilities under 1e-12 are left out of the pmf.
+    """
+    k = int(_levels(levels)[0])
+    std = math.sqrt(k) / 2
+    # Binomial(k, 1/2) pmf: exact integer ratios for ordinary level
+    # counts, log-gamma beyond that.  Only the window within 8 standard
+    # deviations can clear the cutoff.
+    lo = max(0, math.floor(k / 2 - 8 * std - 1))
+    hi = min(k, math.ceil(k / 2 + 8 * std + 1))
+    log_norm = math.lgamma(k + 1) - k * math.log(2)
+    pmf = []
+    for j in range(lo, hi + 1):
+        if k <= _EXACT_PMF_LEVELS:
+            p = math.comb(k, j) / 2 ** k
+        else:
+            p = math.exp(log_norm - math.lgamma(j + 1) - math.lgamma(k - j + 1))
+        if p >= _PMF_CUTOFF:
+            pmf.append((j, p))
+    result = {}
+    for label, offset in zip(stat_blocks.LABELS, np.asarray(stat_offsets).tolist()):
+        shift = offset * k
+        result[label] = {
+            'min': shift,
+            'max': shift + k,
+            'mean': shift + k / 2,
+            'std': std,
+            'pmf': {shift + j: p for j, p in pmf},
+        }
+    return result
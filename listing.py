@@ -0,0 +1,78 @@
+import config
+
+# Keyset-paginated list views.  Pages are cursored on the name primary
+# key (WHERE name > ? ORDER BY name LIMIT ?), so every page is an index
+# range scan regardless of how deep the GM has paged.  List views only
+# load the summary projection; the large text columns come from the
+# per-row detail lookups.
+
+SPECIES_SUMMARY_COLUMNS = """
+    p.name,
+    p.HP,
+    p.Atk AS Attack,
+    p.Def AS Defense,
+    p.SpA AS SpAtk,
+    p.SpD AS SpDef,
+    p.Spe AS Speed,
+    p.abilities
+"""
+
+MOVE_SUMMARY_COLUMNS = "m.name, m.ac, m.damage"
+
+
+def page_size(value):
+    """Clamp a requested page size to 1..config.MAX_PAGE_SIZE."""
+    try:
+        size = int(value)
+    except (TypeError, ValueError):
+        return config.DEFAULT_PAGE_SIZE
+    return min(max(size, 1), config.MAX_PAGE_SIZE)
+
+
+def _page(conn, sql_select, table_alias, after, size, where='', params=()):
+    clauses = [where] if where else []
+    args = list(params)
+    if after:
+        clauses.append(f"{table_alias}.name > ?")
+        args.append(after)
+    where_sql = f"WHERE {' AND '.join(clauses)}" if clauses else ''
+    rows = conn.execute(f"{sql_select} {where_sql} ORDER BY {table_alias}.name LIMIT ?",
+                        args + [size + 1]).fetchall()
+    # One extra row tells us whether there is a next page
+    next_cursor = rows[size - 1]['name'] if len(rows) > size else None
+    return rows[:size], next_cursor
+
+
+def species_page(conn, after=None, size=None):
+    """(summary rows, cursor for the next page or None)."""
+    return _page(conn, f"SELECT {SPECIES_SUMMARY_COLUMNS} FROM pokemon p", 'p',
+                 after, size or config.DEFAULT_PAGE_SIZE)
+
+
+def species_by_name_substring(conn, text, after=None, size=None):
+    return _page(conn, f"SELECT {SPECIES_SUMMARY_COLUMNS} FROM pokemon p", 'p',
+                 after, size or config.DEFAULT_PAGE_SIZE,
+                 where="p.name LIKE ?", params=(f"%{text}%",))
+
+
+def species_detail(conn, name):
+    return conn.execute("""
+        SELECT name, HP, Atk, Def, SpA, SpD, Spe, capabilities, skills, abilities
+        FROM pokemon WHERE name = ?
+    """, (name,)).fetchone()
+
+
+def moves_page(conn, after=None, size=None):
+    return _page(conn, f"SELECT {MOVE_SUMMARY_COLUMNS} FROM moves m", 'm',
+                 after, size or config.DEFAULT_PAGE_SIZE)
+
+
+def moves_by_name_substring(conn, text, after=None, size=None):
+    return _page(conn, f"SELECT {MOVE_SUMMARY_COLUMNS} FROM moves m", 'm',
+                 after, size or config.DEFAULT_PAGE_SIZE,
+                 where="m.name LIKE ?", params=(f"%{text}%",))
+
+
+def move_detail(conn, name):
+    return conn.execute("SELECT name, ac, damage, effect FROM moves WHERE name = ?",
+                        (name,)).fetchone()
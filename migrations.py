@@ -0,0 +1,239 @@
+import sqlite3
+
+import config
+import evolutions
+import move_store
+import settlement
+import species_stats
+import trainer_stats
+
+# Versioned schema changes, applied in order at startup.  The current
+# version lives in PRAGMA user_version, so each step runs exactly once per
+# database.  A step is either a SQL string or a callable taking the
+# connection (for data migrations).
+MIGRATIONS = [
+    (1, "base tables", [
+        '''CREATE TABLE IF NOT EXISTS pokemon
+           (name TEXT PRIMARY KEY,
+            stats TEXT,
+            capabilities TEXT,
+            skills TEXT,
+            abilities TEXT,
+            HP INTEGER DEFAULT 0,
+            Atk INTEGER DEFAULT 0,
+            Def INTEGER DEFAULT 0,
+            SpA INTEGER DEFAULT 0,
+            SpD INTEGER DEFAULT 0,
+            Spe INTEGER DEFAULT 0)''',
+        '''CREATE TABLE IF NOT EXISTS moves
+           (name TEXT PRIMARY KEY, ac INTEGER, damage TEXT, effect TEXT)''',
+        '''CREATE TABLE IF NOT EXISTS encounters
+           (table_name TEXT PRIMARY KEY, data TEXT)''',
+        '''CREATE TABLE IF NOT EXISTS trainers
+           (id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP)''',
+        '''CREATE TABLE IF NOT EXISTS trainer_inventory
+           (id INTEGER PRIMARY KEY AUTOINCREMENT,
+            trainer_id INTEGER,
+            item_name TEXT,
+            quantity INTEGER DEFAULT 1,
+            FOREIGN KEY (trainer_id) REFERENCES trainers (id))''',
+        '''CREATE TABLE IF NOT EXISTS trainer_pokemon
+           (id INTEGER PRIMARY KEY AUTOINCREMENT,
+            trainer_id INTEGER,
+            pokemon_name TEXT,
+            nickname TEXT,
+            level INTEGER DEFAULT 5,
+            nature TEXT,
+            gender TEXT,
+            is_shiny BOOLEAN DEFAULT 0,
+            is_active BOOLEAN DEFAULT 1,
+            FOREIGN KEY (trainer_id) REFERENCES trainers (id))''',
+        '''CREATE TABLE IF NOT EXISTS saved_encounters
+           (id INTEGER PRIMARY KEY AUTOINCREMENT,
+            encounter_text TEXT,
+            saved_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP)''',
+    ]),
+    (2, "indexes for hot queries", [
+        "CREATE INDEX IF NOT EXISTS idx_trainers_created_at ON trainers (created_at)",
+        "CREATE INDEX IF NOT EXISTS idx_trainer_inventory_trainer ON trainer_inventory (trainer_id, item_name)",
+        "CREATE INDEX IF NOT EXISTS idx_trainer_pokemon_trainer ON trainer_pokemon (trainer_id, is_active, pokemon_name)",
+        "CREATE INDEX IF NOT EXISTS idx_saved_encounters_saved_at ON saved_encounters (saved_at)",
+    ]),
+    (3, "typed stat columns are the source of truth", [
+        species_stats.reconcile,
+    ]),
+    (4, "full-text index over species text", [
+        # Keeps its own copy of the text rather than using external content:
+        # INSERT OR REPLACE (CSV import, offline scripts) does not fire the
+        # delete trigger, so the insert trigger clears stale entries itself.
+        '''CREATE VIRTUAL TABLE IF NOT EXISTS pokemon_fts USING fts5
+           (name, capabilities, skills, abilities,
+            tokenize = 'unicode61 remove_diacritics 2',
+            prefix = '2 3')''',
+        '''INSERT INTO pokemon_fts (rowid, name, capabilities, skills, abilities)
+           SELECT rowid, name, capabilities, skills, abilities FROM pokemon''',
+        '''CREATE TRIGGER IF NOT EXISTS pokemon_fts_insert AFTER INSERT ON pokemon BEGIN
+               DELETE FROM pokemon_fts WHERE rowid = new.rowid OR name = new.name;
+               INSERT INTO pokemon_fts (rowid, name, capabilities, skills, abilities)
+               VALUES (new.rowid, new.name, new.capabilities, new.skills, new.abilities);
+           END''',
+        '''CREATE TRIGGER IF NOT EXISTS pokemon_fts_delete AFTER DELETE ON pokemon BEGIN
+               DELETE FROM pokemon_fts WHERE rowid = old.rowid;
+           END''',
+        '''CREATE TRIGGER IF NOT EXISTS pokemon_fts_update
+           AFTER UPDATE OF name, capabilities, skills, abilities ON pokemon BEGIN
+               DELETE FROM pokemon_fts WHERE rowid = old.rowid;
+               INSERT INTO pokemon_fts (rowid, name, capabilities, skills, abilities)
+               VALUES (new.rowid, new.name, new.capabilities, new.skills, new.abilities);
+           END''',
+    ]),
+    (5, "full-text index over move effects", [
+        '''CREATE VIRTUAL TABLE IF NOT EXISTS moves_fts USING fts5
+           (name, effect,
+            tokenize = 'unicode61 remove_diacritics 2',
+            prefix = '2 3')''',
+        '''INSERT INTO moves_fts (rowid, name, effect)
+           SELECT rowid, name, effect FROM moves''',
+        '''CREATE TRIGGER IF NOT EXISTS moves_fts_insert AFTER INSERT ON moves BEGIN
+               DELETE FROM moves_fts WHERE rowid = new.rowid OR name = new.name;
+               INSERT INTO moves_fts (rowid, name, effect)
+               VALUES (new.rowid, new.name, new.effect);
+           END''',
+        '''CREATE TRIGGER IF NOT EXISTS moves_fts_delete AFTER DELETE ON moves BEGIN
+               DELETE FROM moves_fts WHERE rowid = old.rowid;
+           END''',
+        '''CREATE TRIGGER IF NOT EXISTS moves_fts_update
+           AFTER UPDATE OF name, effect ON moves BEGIN
+               DELETE FROM moves_fts WHERE rowid = old.rowid;
+               INSERT INTO moves_fts (rowid, name, effect)
+               VALUES (new.rowid, new.name, new.effect);
+           END''',
+    ]),
+    (6, "typed move damage columns", [
+        "ALTER TABLE moves ADD COLUMN damage_base INTEGER",
+        "ALTER TABLE moves ADD COLUMN dice_count INTEGER",
+        "ALTER TABLE moves ADD COLUMN die_size INTEGER",
+        "ALTER TABLE moves ADD COLUMN damage_bonus INTEGER",
+        "ALTER TABLE moves ADD COLUMN damage_avg REAL",
+        move_store.backfill,
+        "CREATE INDEX IF NOT EXISTS idx_moves_ac_db ON moves (ac, damage_base, damage_avg)",
+        "CREATE INDEX IF NOT EXISTS idx_moves_db_avg ON moves (damage_base, damage_avg)",
+        "CREATE INDEX IF NOT EXISTS idx_moves_avg ON moves (damage_avg, damage_base)",
+    ]),
+    (7, "evolution graph", [
+        '''CREATE TABLE IF NOT EXISTS evolutions
+           (species TEXT NOT NULL,
+            evolves_to TEXT NOT NULL,
+            min_level INTEGER NOT NULL,
+            PRIMARY KEY (species, evolves_to))''',
+        "CREATE INDEX IF NOT EXISTS idx_evolutions_to ON evolutions (evolves_to)",
+        evolutions.load_file,
+    ]),
+    (8, "versioned encounter tables and replayable saved encounters", [
+        "ALTER TABLE encounters ADD COLUMN version INTEGER NOT NULL DEFAULT 1",
+        '''CREATE TABLE IF NOT EXISTS encounter_table_versions
+           (table_name TEXT NOT NULL,
+            version INTEGER NOT NULL,
+            data TEXT NOT NULL,
+            saved_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (table_name, version))''',
+        '''INSERT OR IGNORE INTO encounter_table_versions (table_name, version, data)
+           SELECT table_name, version, data FROM encounters''',
+        # Rows saved from here on carry the roll session instead of HTML
+        "ALTER TABLE saved_encounters ADD COLUMN seed INTEGER",
+        "ALTER TABLE saved_encounters ADD COLUMN table_name TEXT",
+        "ALTER TABLE saved_encounters ADD COLUMN table_version INTEGER",
+        "ALTER TABLE saved_encounters ADD COLUMN mode TEXT",
+        "ALTER TABLE saved_encounters ADD COLUMN party TEXT",
+        "ALTER TABLE saved_encounters ADD COLUMN n INTEGER",
+        "ALTER TABLE saved_encounters ADD COLUMN encounter_number INTEGER",
+        "ALTER TABLE saved_encounters ADD COLUMN pokemon_index INTEGER",
+    ]),
+    (9, "EXP state on trainer Pokémon", [
+        "ALTER TABLE trainer_pokemon ADD COLUMN exp INTEGER NOT NULL DEFAULT 0",
+        "ALTER TABLE trainer_pokemon ADD COLUMN growth_rate TEXT NOT NULL DEFAULT 'medium fast'",
+        settlement.backfill_exp,
+    ]),
+    (10, "one inventory row per trainer and item", [
+        # Fold duplicate stacks into the oldest row before enforcing it
+        '''UPDATE trainer_inventory
+           SET quantity = (SELECT SUM(d.quantity) FROM trainer_inventory d
+                           WHERE d.trainer_id = trainer_inventory.trainer_id
+                             AND d.item_name = trainer_inventory.item_name)
+           WHERE id IN (SELECT MIN(id) FROM trainer_inventory
+                        GROUP BY trainer_id, item_name HAVING COUNT(*) > 1)''',
+        '''DELETE FROM trainer_inventory
+           WHERE id NOT IN (SELECT MIN(id) FROM trainer_inventory GROUP BY trainer_id, item_name)''',
+        "DROP INDEX IF EXISTS idx_trainer_inventory_trainer",
+        "CREATE UNIQUE INDEX IF NOT EXISTS idx_trainer_inventory_item ON trainer_inventory (trainer_id, item_name)",
+    ]),
+    (11, "stored stat blocks on trainer Pokémon", [
+        *(f"ALTER TABLE trainer_pokemon ADD COLUMN {col} INTEGER" for col in trainer_stats.COLUMNS),
+        trainer_stats.backfill,
+    ]),
+    (12, "row versions for concurrent sheet edits", [
+        "ALTER TABLE trainers ADD COLUMN version INTEGER NOT NULL DEFAULT 1",
+        "ALTER TABLE trainer_pokemon ADD COLUMN version INTEGER NOT NULL DEFAULT 1",
+        "ALTER TABLE trainer_inventory ADD COLUMN version INTEGER NOT NULL DEFAULT 1",
+    ]),
+    (13, "replay fingerprints for saved encounters", [
+        "ALTER TABLE saved_encounters ADD COLUMN replay_digest TEXT",
+    ]),
+    (14, "species catalog generation shared between workers", [
+        '''CREATE TABLE IF NOT EXISTS catalog_generation
+           (id INTEGER PRIMARY KEY CHECK (id = 1),
+            generation INTEGER NOT NULL)''',
+        "INSERT OR IGNORE INTO catalog_generation (id, generation) VALUES (1, 0)",
+        *(f'''CREATE TRIGGER IF NOT EXISTS {table}_{event.lower()}_generation AFTER {event} ON {table} BEGIN
+               UPDATE catalog_generation SET generation = generation + 1;
+           END''' for table in ('pokemon', 'evolutions') for event in ('INSERT', 'UPDATE', 'DELETE')),
+    ]),
+]
+
+
+def schema_version(conn):
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def migrate(conn):
+    """Apply every pending migration, each in its own transaction.
+
+    The version is re-read once the write lock is held, so workers
+    starting on the same database skip steps another one already applied.
+    """
+    applied = []
+    for version, description, steps in MIGRATIONS:
+        if version <= schema_version(conn):
+            continue
+        conn.execute("BEGIN IMMEDIATE")
+        if version <= schema_version(conn):
+            conn.execute("ROLLBACK")
+            continue
+        try:
+            for step in steps:
+                if callable(step):
+                    step(conn)
+                else:
+                    conn.execute(step)
+            conn.execute(f"PRAGMA user_version = {int(version)}")
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        applied.append((version, description))
+    return applied
+
+
+def run(path=None):
+    conn = sqlite3.connect(path or config.DATABASE, timeout=config.SQLITE_BUSY_TIMEOUT_MS / 1000)
+    try:
+        for version, description in migrate(conn):
+            print(f"Applied migration {version}: {description}")
+    finally:
+        conn.close()
+
+
+if __name__ == '__main__':
+    run()
@@ -0,0 +1,142 @@
+import math
+import re
+
+# Moves keep their free-text damage string ("DB 9: 2d10+10 / 21") for
+# display, plus typed columns parsed from it so queries can filter and
+# sort on damage base, dice and average without touching Python.
+
+DAMAGE_COLUMNS = ('damage_base', 'dice_count', 'die_size', 'damage_bonus', 'damage_avg')
+
+_DAMAGE = re.compile(
+    r'DB\s*(?P<db>\d+)\s*:\s*(?P<count>\d+)\s*d\s*(?P<size>\d+)'
+    r'(?:\s*\+\s*(?P<bonus>\d+))?(?:\s*/\s*(?P<avg>\d+(?:\.\d+)?))?',
+    re.IGNORECASE)
+_DAMAGE_BASE_ONLY = re.compile(r'DB\s*(?P<db>\d+)', re.IGNORECASE)
+
+# Columns the move query may sort on, by request name
+SORT_COLUMNS = {
+    'name': 'name',
+    'ac': 'ac',
+    'db': 'damage_base',
+    'avg': 'damage_avg',
+}
+
+# Numeric filters the move query accepts, with their types
+FILTERS = {
+    'ac': int,
+    'db_min': int,
+    'db_max': int,
+    'avg_min': float,
+    'avg_max': float,
+}
+
+
+def parse_query(args):
+    """query_moves() keyword arguments from query-string values.
+
+    Blank filters are left out.  Raises ValueError for a filter that is
+    not a number or an unknown sort.
+    """
+    query = {}
+    for key, kind in FILTERS.items():
+        value = (args.get(key) or '').strip()
+        if not value:
+            continue
+        error = f'"{key}" must be a whole number' if kind is int else f'"{key}" must be a number'
+        try:
+            query[key] = kind(value)
+        except ValueError:
+            raise ValueError(error) from None
+        if not math.isfinite(query[key]):
+            raise ValueError(error)
+    sort = args.get('sort') or 'name'
+    if sort not in SORT_COLUMNS:
+        raise ValueError(f'"sort" must be one of {", ".join(SORT_COLUMNS)}')
+    query['sort'] = sort
+    query['descending'] = args.get('order') == 'desc'
+    return query
+
+
+def parse_damage(text):
+    """{column: value} for a damage string; all None for status moves.
+
+    The average printed after the slash wins; otherwise it is computed
+    from the dice as count * (size + 1) / 2 + bonus.
+    """
+    parsed = dict.fromkeys(DAMAGE_COLUMNS)
+    if not text:
+        return parsed
+    match = _DAMAGE.search(text)
+    if match:
+        count, size = int(match['count']), int(match['size'])
+        bonus = int(match['bonus'] or 0)
+        avg = float(match['avg']) if match['avg'] else count * (size + 1) / 2 + bonus
+        parsed.update(damage_base=int(match['db']), dice_count=count, die_size=size,
+                      damage_bonus=bonus, damage_avg=avg)
+        return parsed
+    match = _DAMAGE_BASE_ONLY.search(text)
+    if match:
+        parsed['damage_base'] = int(match['db'])
+    return parsed
+
+
+def insert_move(conn, name, ac, damage, effect):
+    parsed = parse_damage(damage)
+    conn.execute(f"""
+        INSERT INTO moves (name, ac, damage, effect, {', '.join(DAMAGE_COLUMNS)})
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+    """, (name, ac, damage, effect) + tuple(parsed[col] for col in DAMAGE_COLUMNS))
+
+
+def update_move(conn, name, ac, damage, effect):
+    parsed = parse_damage(damage)
+    assignments = ', '.join(f"{col} = ?" for col in DAMAGE_COLUMNS)
+    conn.execute(f"""
+        UPDATE moves
+        SET ac = ?, damage = ?, effect = ?, {assignments}
+        WHERE name = ?
+    """, (ac, damage, effect) + tuple(parsed[col] for col in DAMAGE_COLUMNS) + (name,))
+
+
+def backfill(conn):
+    """Migration step: parse the damage string of every existing move."""
+    rows = conn.execute("SELECT name, damage FROM moves").fetchall()
+    conn.executemany(
+        f"UPDATE moves SET {', '.join(f'{col} = ?' for col in DAMAGE_COLUMNS)} WHERE name = ?",
+        [tuple(parse_damage(damage)[col] for col in DAMAGE_COLUMNS) + (name,)
+         for name, damage in rows])
+
+
+def query_moves(conn, ac=None, db_min=None, db_max=None, avg_min=None, avg_max=None,
+                sort='name', descending=False, limit=50):
+    """Filter moves by AC, damage base range and average damage.
+
+    Damaging moves only are returned once any damage filter is given, and
+    sorting by db/avg puts moves without damage last.
+    """
+    clauses, args = [], []
+    if ac is not None:
+        clauses.append("ac = ?")
+        args.append(ac)
+    if db_min is not None:
+        clauses.append("damage_base >= ?")
+        args.append(db_min)
+    if db_max is not None:
+        clauses.append("damage_base <= ?")
+        args.append(db_max)
+    if avg_min is not None:
+        clauses.append("damage_avg >= ?")
+        args.append(avg_min)
+    if avg_max is not None:
+        clauses.append("damage_avg <= ?")
+        args.append(avg_max)
+    column = SORT_COLUMNS.get(sort, 'name')
+    direction = 'DESC' if descending else 'ASC'
+    where_sql = f"WHERE {' AND '.join(clauses)}" if clauses else ''
+    return conn.execute(f"""
+        SELECT name, ac, damage, {', '.join(DAMAGE_COLUMNS)}
+        FROM moves
+        {where_sql}
+        ORDER BY {column} IS NULL, {column} {direction}, name
+        LIMIT ?
+    """, args + [limit]).fetchall()
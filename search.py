@@ -0,0 +1,77 @@
+import re
+
+from markupsafe import Markup, escape
+
+from listing import SPECIES_SUMMARY_COLUMNS
+
+# Full-text search over the FTS5 indexes created by migrations.py.
+# User input is reduced to word tokens and every token becomes a quoted
+# prefix query, so nothing the GM types can break the MATCH syntax.
+
+_TOKEN = re.compile(r'\w+', re.UNICODE)
+
+
+def fts_query(text):
+    """'swimmer unaw' -> '"swimmer"* AND "unaw"*' (empty string if no terms)."""
+    return ' AND '.join(f'"{token}"*' for token in _TOKEN.findall(text))
+
+
+def _ranked_page(rows, limit, offset):
+    """(rows, offset of the next page or None) from a limit + 1 fetch."""
+    return rows[:limit], offset + limit if len(rows) > limit else None
+
+
+def search_species(conn, text, limit=100, offset=0):
+    """Species ranked by bm25 over name, capabilities, skills and abilities.
+
+    Name hits weigh most, then abilities, then capabilities/skills.
+    Returns (rows, offset of the next page or None).
+    """
+    query = fts_query(text)
+    if not query:
+        return [], None
+    rows = conn.execute(f"""
+        SELECT {SPECIES_SUMMARY_COLUMNS}
+        FROM pokemon_fts
+        JOIN pokemon p ON p.rowid = pokemon_fts.rowid
+        WHERE pokemon_fts MATCH ?
+        ORDER BY bm25(pokemon_fts, 10.0, 2.0, 1.0, 4.0), p.name
+        LIMIT ? OFFSET ?
+    """, (query, limit + 1, offset)).fetchall()
+    return _ranked_page(rows, limit, offset)
+
+
+# snippet() markers; swapped for <mark> after the text is HTML-escaped
+_HL_OPEN, _HL_CLOSE = '\x02', '\x03'
+
+
+def _highlighted(snippet):
+    escaped = str(escape(snippet))
+    return Markup(escaped.replace(_HL_OPEN, '<mark>').replace(_HL_CLOSE, '</mark>'))
+
+
+def search_moves(conn, text, limit=100, offset=0):
+    """Moves ranked by bm25 over name and effect text.
+
+    Results use the list projection plus `effect_html`, a short excerpt of
+    the effect with the matched terms wrapped in <mark>.  Returns (rows,
+    offset of the next page or None).
+    """
+    query = fts_query(text)
+    if not query:
+        return [], None
+    rows = conn.execute("""
+        SELECT m.name, m.ac, m.damage,
+               snippet(moves_fts, 1, ?, ?, '…', 24) AS excerpt
+        FROM moves_fts
+        JOIN moves m ON m.rowid = moves_fts.rowid
+        WHERE moves_fts MATCH ?
+        ORDER BY bm25(moves_fts, 5.0, 1.0), m.name
+        LIMIT ? OFFSET ?
+    """, (_HL_OPEN, _HL_CLOSE, query, limit + 1, offset)).fetchall()
+    results = []
+    for row in rows:
+        move = dict(row)
+        move['effect_html'] = _highlighted(move.pop('excerpt') or '')
+        results.append(move)
+    return _ranked_page(results, limit, offset)
@@ -0,0 +1,51 @@
+import hashlib
+import random
+import secrets
+
+import numpy as np
+
+# Every roll session gets its own generator seeded from a recorded seed,
+# so a result can be replayed exactly and threads never share the
+# module-level `random` state.  Long sessions derive one pair of
+# generators per chunk from (seed, chunk index), so any chunk can be
+# re-rolled on its own.
+
+SEED_BITS = 48  # stays exact as a JavaScript number
+
+
+def new_seed():
+    return secrets.randbits(SEED_BITS)
+
+
+def parse(value):
+    """Seed from a form or query value; a fresh one when blank.
+
+    Raises ValueError for anything that is not a non-negative integer.
+    """
+    if value is None or not str(value).strip():
+        return new_seed()
+    seed = int(value)
+    if seed < 0:
+        raise ValueError("Seed must be a non-negative integer")
+    return seed
+
+
+def rng(seed):
+    """Per-session `random.Random` for `seed`."""
+    return random.Random(seed)
+
+
+def numpy_rng(seed):
+    """NumPy Generator for the batched parts of the same session."""
+    return np.random.default_rng(seed)
+
+
+def chunk_rng(seed, index):
+    """`random.Random` for chunk `index` of the session from `seed`."""
+    digest = hashlib.sha256(f"{seed}:{index}".encode()).digest()
+    return random.Random(int.from_bytes(digest, 'big'))
+
+
+def chunk_numpy_rng(seed, index):
+    """NumPy Generator for chunk `index` of the session from `seed`."""
+    return np.random.default_rng(np.random.SeedSequence(seed, spawn_key=(index,)))
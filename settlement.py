@@ -0,0 +1,111 @@
+import exp_tables
+import trainer_stats
+import trainer_store
+
+# Post-battle EXP: the EXP pool from everything defeated is shared out
+# among the participating trainer Pokémon, each share scaled by the
+# gainer's growth-rate multiplier, and every level/EXP change (with the
+# stat gains for any levels gained) is written in one transaction.
+
+MAX_PARTICIPANTS = 36
+MAX_DEFEATED = 100
+
+
+def backfill_exp(conn):
+    """One-time migration: start each Pokémon at its level's threshold."""
+    rows = conn.execute("SELECT id, level, growth_rate FROM trainer_pokemon").fetchall()
+    updates = []
+    for pokemon_id, level, rate in rows:
+        level = min(max(int(level or 1), 1), exp_tables.MAX_LEVEL)
+        updates.append((exp_tables.exp_for_level(rate, level), pokemon_id))
+    conn.executemany("UPDATE trainer_pokemon SET exp = ? WHERE id = ?", updates)
+
+
+def parse_defeated(defeated):
+    """[(base_exp, level)] from [{"base_exp": 64, "level": 12, ...}]."""
+    if not isinstance(defeated, list) or not defeated:
+        raise ValueError('"defeated" must be a non-empty list')
+    if len(defeated) > MAX_DEFEATED:
+        raise ValueError(f"At most {MAX_DEFEATED} defeated Pokémon per settlement")
+    parsed = []
+    for i, d in enumerate(defeated, 1):
+        try:
+            base_exp, level = int(d['base_exp']), int(d['level'])
+        except (KeyError, TypeError, ValueError) as e:
+            raise ValueError(f"defeated {i} needs whole-number base_exp and level") from e
+        if base_exp < 0 or not 1 <= level <= exp_tables.MAX_LEVEL:
+            raise ValueError(f"defeated {i} has an out-of-range base_exp or level")
+        parsed.append((base_exp, level))
+    return parsed
+
+
+def parse_participants(participant_ids):
+    """Distinct trainer Pokémon ids, in order, from a list of ints."""
+    if not isinstance(participant_ids, list) or not participant_ids:
+        raise ValueError('"participants" must be a non-empty list of trainer Pokémon ids')
+    for i in participant_ids:
+        if not isinstance(i, int) or isinstance(i, bool):
+            raise ValueError(f'"participants" must be whole-number ids, not {i!r}')
+    ids = list(dict.fromkeys(participant_ids))
+    if len(ids) > MAX_PARTICIPANTS:
+        raise ValueError(f"At most {MAX_PARTICIPANTS} participants per settlement")
+    return ids
+
+
+def settle(conn, defeated, participant_ids, split=True):
+    """Apply a battle's EXP to `participant_ids`; returns one dict each.
+
+    With `split` the pool is divided evenly among participants (the
+    default); without it every participant earns the full pool.  Raises
+    ValueError (and writes nothing) if any participant is unknown.
+    """
+    pool = sum(base_exp * level / 7 for base_exp, level in parse_defeated(defeated))
+    ids = parse_participants(participant_ids)
+    share = pool / len(ids) if split else pool
+
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        marks = ','.join('?' * len(ids))
+        rows = conn.execute(
+            f"""SELECT id, trainer_id, pokemon_name, nickname, level, nature, exp, growth_rate,
+                       {', '.join(trainer_stats.COLUMNS)}
+                FROM trainer_pokemon WHERE id IN ({marks})""", ids).fetchall()
+        found = {row['id'] for row in rows}
+        missing = [i for i in ids if i not in found]
+        if missing:
+            raise ValueError(f"Unknown trainer Pokémon id {missing[0]}")
+
+        results, states = [], []
+        for row in rows:
+            rate = row['growth_rate']
+            level = min(max(row['level'], 1), exp_tables.MAX_LEVEL)
+            earned = round(share * exp_tables.MULTIPLIERS[rate][level - 1])
+            after = exp_tables.gain(rate, level, row['exp'], earned)
+            states.append(after)
+            results.append(dict(
+                after._asdict(),
+                id=row['id'],
+                trainer_id=row['trainer_id'],
+                pokemon_name=row['pokemon_name'],
+                nickname=row['nickname'],
+                level_before=row['level'],
+                exp_gained=earned,
+            ))
+        stats = trainer_stats.level_up(rows, [st.level for st in states])
+        for result, values in zip(results, stats):
+            result['hit_points'] = values[trainer_stats.COLUMNS.index('hit_points')]
+        assignments = ', '.join(f"{col} = ?" for col in trainer_stats.COLUMNS)
+        conn.executemany(
+            f"UPDATE trainer_pokemon SET level = ?, exp = ?, {assignments}, version = version + 1 WHERE id = ?",
+            [(st.level, st.exp) + values + (row['id'],) for row, st, values in zip(rows, states, stats)])
+        trainer_ids = sorted({row['trainer_id'] for row in rows})
+        conn.execute(f"UPDATE trainers SET version = version + 1 WHERE id IN ({','.join('?' * len(trainer_ids))})",
+                     trainer_ids)
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+    for trainer_id in trainer_ids:
+        trainer_store.publish(conn, trainer_id, pokemon_ids=[r['id'] for r in results if r['trainer_id'] == trainer_id])
+    results.sort(key=lambda r: ids.index(r['id']))
+    return results
@@ -0,0 +1,125 @@
+import json
+
+# The typed HP/Atk/Def/SpA/SpD/Spe columns on `pokemon` are the source of
+# truth for base stats.  The legacy `stats` JSON blob is only kept in sync
+# for the offline scripts; it was written with two different key sets
+# ("SpAtk" from extract_data.py, "Special Attack" from the web forms).
+
+STAT_COLUMNS = ('HP', 'Atk', 'Def', 'SpA', 'SpD', 'Spe')
+
+# Display label used by the roll/generator pages, per column
+STAT_LABELS = {
+    'HP': 'HP',
+    'Atk': 'Attack',
+    'Def': 'Defense',
+    'SpA': 'Special Attack',
+    'SpD': 'Special Defense',
+    'Spe': 'Speed',
+}
+
+# Every key we have seen in the JSON blob, mapped to its column
+JSON_KEY_ALIASES = {
+    'HP': 'HP',
+    'Attack': 'Atk', 'Atk': 'Atk',
+    'Defense': 'Def', 'Def': 'Def',
+    'Special Attack': 'SpA', 'SpAtk': 'SpA', 'SpA': 'SpA', 'Sp. Atk': 'SpA',
+    'Special Defense': 'SpD', 'SpDef': 'SpD', 'SpD': 'SpD', 'Sp. Def': 'SpD',
+    'Speed': 'Spe', 'Spe': 'Spe',
+}
+
+MAX_BASE_STAT = 255
+
+NATURES = ("Adamant", "Modest", "Timid", "Jolly", "Bold", "Calm", "Impish", "Lax", "Relaxed",
+           "Sassy", "Gentle", "Hasty", "Naive", "Naughty", "Rash", "Brave", "Quiet", "Mild",
+           "Lonely", "Hardy", "Docile", "Quirky", "Serious", "Bashful")
+
+# (boosted, hindered) stat labels; the five neutral natures are absent
+NATURE_EFFECTS = {
+    "Lonely": ("Attack", "Defense"), "Brave": ("Attack", "Speed"),
+    "Adamant": ("Attack", "Special Attack"), "Naughty": ("Attack", "Special Defense"),
+    "Bold": ("Defense", "Attack"), "Relaxed": ("Defense", "Speed"),
+    "Impish": ("Defense", "Special Attack"), "Lax": ("Defense", "Special Defense"),
+    "Timid": ("Speed", "Attack"), "Hasty": ("Speed", "Defense"),
+    "Jolly": ("Speed", "Special Attack"), "Naive": ("Speed", "Special Defense"),
+    "Modest": ("Special Attack", "Attack"), "Mild": ("Special Attack", "Defense"),
+    "Quiet": ("Special Attack", "Speed"), "Rash": ("Special Attack", "Special Defense"),
+    "Calm": ("Special Defense", "Attack"), "Gentle": ("Special Defense", "Defense"),
+    "Sassy": ("Special Defense", "Speed"),
+}
+
+
+def validate(values):
+    """Check a {column: value} mapping and return it with int values.
+
+    Raises ValueError with a message suitable for flashing to the GM.
+    """
+    clean = {}
+    for col in STAT_COLUMNS:
+        raw = values.get(col)
+        try:
+            value = int(raw)
+        except (TypeError, ValueError):
+            raise ValueError(f"{STAT_LABELS[col]} must be a whole number (got {raw!r})")
+        if not 0 <= value <= MAX_BASE_STAT:
+            raise ValueError(f"{STAT_LABELS[col]} must be between 0 and {MAX_BASE_STAT}")
+        clean[col] = value
+    return clean
+
+
+def from_json(text):
+    """Map a legacy stats blob onto columns; unknown keys are ignored."""
+    try:
+        blob = json.loads(text) if text else {}
+    except json.JSONDecodeError:
+        return {}
+    if not isinstance(blob, dict):
+        return {}
+    values = {}
+    for key, value in blob.items():
+        col = JSON_KEY_ALIASES.get(key)
+        if col and col not in values:
+            try:
+                values[col] = int(value)
+            except (TypeError, ValueError):
+                continue
+    return values
+
+
+def to_json(values):
+    """Canonical stats blob for the given {column: value} mapping."""
+    return json.dumps({STAT_LABELS[col]: values[col] for col in STAT_COLUMNS})
+
+
+def labelled(row):
+    """{label: value} for a row exposing the typed columns."""
+    return {STAT_LABELS[col]: row[col] or 0 for col in STAT_COLUMNS}
+
+
+def reconcile(conn):
+    """One-time migration: make the typed columns authoritative.
+
+    Rows whose columns were never filled (all zero) take their values from
+    the JSON blob; every blob is then rewritten from the columns with the
+    canonical keys so the two can no longer disagree.
+    """
+    cols = ', '.join(STAT_COLUMNS)
+    rows = conn.execute(f"SELECT name, stats, {cols} FROM pokemon").fetchall()
+    updates = []
+    for row in rows:
+        name, blob = row[0], row[1]
+        values = dict(zip(STAT_COLUMNS, (v or 0 for v in row[2:])))
+        if not any(values.values()):
+            from_blob = from_json(blob)
+            if len(from_blob) == len(STAT_COLUMNS):
+                values = from_blob
+        try:
+            values = validate(values)
+        except ValueError as e:
+            print(f"Skipping stats for {name}: {e}")
+            continue
+        canonical = to_json(values)
+        if canonical != blob or list(values.values()) != list(row[2:]):
+            updates.append(tuple(values[col] for col in STAT_COLUMNS) + (canonical, name))
+    conn.executemany(
+        "UPDATE pokemon SET HP=?, Atk=?, Def=?, SpA=?, SpD=?, Spe=?, stats=? WHERE name=?",
+        updates)
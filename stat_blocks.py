@@ -0,0 +1,60 @@
+from collections import namedtuple
+
+import numpy as np
+
+from species_stats import STAT_COLUMNS, STAT_LABELS
+
+# The one place rolled stat blocks are computed.  Every roll path (manual
+# and auto encounters, the generator, hordes) passes arrays of base stats
+# and levels here, so the rules cannot drift between pages:
+#
+#   level gain   multiplier * level // 5, multiplier randint(1, 3) per stat
+#   nature bonus floor((base + level gain) * 0.1)
+#   total        base + level gain + nature bonus
+#   hit points   level + (HP base + HP gain + HP bonus) * 3
+#
+# Arrays are (n, 6) in STAT_COLUMNS order.
+
+LABELS = tuple(STAT_LABELS[col] for col in STAT_COLUMNS)
+HP = STAT_COLUMNS.index('HP')
+
+StatBlocks = namedtuple('StatBlocks', ['base', 'level', 'nature', 'total', 'hit_points'])
+
+
+def roll(rng, base, levels):
+    """Stat blocks for len(levels) Pokémon.
+
+    `rng` is a NumPy Generator, `base` an (n, 6) int array and `levels`
+    length n.
+    """
+    base = np.asarray(base, dtype=np.int64).reshape(-1, len(STAT_COLUMNS))
+    levels = np.asarray(levels, dtype=np.int64).reshape(-1)
+    return from_gains(base, gains_at(roll_multipliers(rng, len(base)), levels), levels)
+
+
+def roll_multipliers(rng, n):
+    """(n, 6) per-stat level-gain multipliers."""
+    return rng.integers(1, 4, size=(n, len(STAT_COLUMNS)))
+
+
+def gains_at(multipliers, levels):
+    """Level gains for rolled multipliers at `levels`."""
+    levels = np.asarray(levels, dtype=np.int64).reshape(-1)
+    return np.asarray(multipliers, dtype=np.int64) * levels[:, None] // 5
+
+
+def from_gains(base, gain, levels):
+    """Stat blocks for known base stats and level gains (e.g. stored ones)."""
+    base = np.asarray(base, dtype=np.int64).reshape(-1, len(STAT_COLUMNS))
+    gain = np.asarray(gain, dtype=np.int64).reshape(base.shape)
+    levels = np.asarray(levels, dtype=np.int64).reshape(-1)
+    # floor(x * 0.1) for the non-negative ints involved, without floats
+    bonus = (base + gain) // 10
+    total = base + gain + bonus
+    hit_points = levels + (base[:, HP] + gain[:, HP] + bonus[:, HP]) * 3
+    return StatBlocks(base, gain, bonus, total, hit_points)
+
+
+def labelled(blocks, i):
+    """{label: value} dicts (base, level, nature, total) for Pokémon `i`."""
+    return tuple(dict(zip(LABELS, part[i].tolist())) for part in blocks[:4])
@@ -0,0 +1,178 @@
+import gzip
+import json
+import zlib
+
+import catalog
+import exp_tables
+import seeds
+import trainer_stats
+import trainer_store
+
+# Trainer handoff between GM machines: gzip'd JSON lines.  The first line
+# is a header naming the format, its version and the Pokémon fields; each
+# following line is one trainer with its inventory and Pokémon as compact
+# arrays in that field order:
+#
+#     {"format": "pte-trainers", "version": 1, "pokemon_fields": ["pokemon_name", ...]}
+#     {"name": "Ash", "created_at": "...", "inventory": [["Potion", 3]], "pokemon": [["Pikachu", ...]]}
+#
+# Export streams one trainer at a time; import validates everything, then
+# writes it with one executemany per table inside a single transaction.
+
+FORMAT = 'pte-trainers'
+VERSION = 1
+MAX_TRAINERS = 1000
+POKEMON_FIELDS = ('pokemon_name', 'nickname', 'level', 'nature', 'gender', 'is_shiny', 'is_active',
+                  'exp', 'growth_rate') + trainer_stats.COLUMNS
+# Positions in a POKEMON_FIELDS row
+_NAME, _LEVEL, _ACTIVE = (POKEMON_FIELDS.index(f) for f in ('pokemon_name', 'level', 'is_active'))
+_STATS = POKEMON_FIELDS.index(trainer_stats.COLUMNS[0])
+
+
+def _lines(conn, trainer_ids=None):
+    yield {'format': FORMAT, 'version': VERSION, 'pokemon_fields': POKEMON_FIELDS}
+    if trainer_ids is None:
+        trainers = conn.execute("SELECT id, name, created_at FROM trainers ORDER BY id").fetchall()
+    else:
+        marks = ','.join('?' * len(trainer_ids))
+        trainers = conn.execute(f"SELECT id, name, created_at FROM trainers WHERE id IN ({marks}) ORDER BY id",
+                                list(trainer_ids)).fetchall()
+    for trainer_id, name, created_at in trainers:
+        inventory = conn.execute(
+            "SELECT item_name, quantity FROM trainer_inventory WHERE trainer_id = ? ORDER BY item_name",
+            (trainer_id,)).fetchall()
+        pokemon = conn.execute(
+            f"""SELECT {', '.join(POKEMON_FIELDS)} FROM trainer_pokemon WHERE trainer_id = ?
+                ORDER BY is_active, pokemon_name""", (trainer_id,)).fetchall()
+        yield {
+            'name': name,
+            'created_at': created_at,
+            'inventory': [list(row) for row in inventory],
+            'pokemon': [list(row) for row in pokemon],
+        }
+
+
+def dump(conn, trainer_ids=None):
+    """Gzip'd JSON-lines export as a stream of byte chunks.
+
+    `trainer_ids` limits it to those trainers; by default all of them.
+    """
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS)  # gzip container
+    for record in _lines(conn, trainer_ids):
+        chunk = compressor.compress((json.dumps(record, ensure_ascii=False) + '\n').encode())
+        if chunk:
+            yield chunk
+    yield compressor.flush()
+
+
+def _resolver(species_catalog):
+    folded = {catalog.fold(name): name for name in species_catalog.names}
+
+    def resolve(name):
+        if name in species_catalog:
+            return species_catalog.get(name).name
+        return folded.get(catalog.fold(str(name or '')))
+    return resolve
+
+
+def _pokemon(values, fields, resolve):
+    """One trainer_pokemon row (POKEMON_FIELDS order, as a list) from an exported array."""
+    p = dict(zip(fields, values))
+    species = resolve(p.get('pokemon_name'))
+    if species is None:
+        raise ValueError(f"unknown Pokémon '{p.get('pokemon_name')}'")
+    level = int(p.get('level') or 5)
+    rate = exp_tables.growth_rate(str(p.get('growth_rate') or ''))
+    exp = max(int(p.get('exp') or 0), exp_tables.exp_for_level(rate, level))
+    if p.get('base_HP') is None:
+        stats = [None] * len(trainer_stats.COLUMNS)  # rolled on import
+    elif any(p.get(col) is None for col in trainer_stats.COLUMNS):
+        raise ValueError(f"incomplete stat block for '{species}'")
+    else:
+        stats = [int(p[col]) for col in trainer_stats.COLUMNS]
+    return [species, p.get('nickname') or '', level, p.get('nature') or 'Hardy', p.get('gender') or '♂',
+            int(bool(p.get('is_shiny'))), int(bool(p.get('is_active', True))), exp, rate] + stats
+
+
+def _records(fileobj, species_catalog):
+    """(name, created_at, inventory, pokemon) per trainer in an export."""
+    resolve = _resolver(species_catalog)
+    with gzip.GzipFile(fileobj=fileobj) as f:
+        header = None
+        for number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            if header is None:
+                header = json.loads(line)
+                if not isinstance(header, dict) or header.get('format') != FORMAT:
+                    raise ValueError("Not a trainer export")
+                if header.get('version') != VERSION:
+                    raise ValueError(f"Unsupported trainer export version {header.get('version')!r}")
+                fields = header.get('pokemon_fields') or POKEMON_FIELDS
+                continue
+            if number > MAX_TRAINERS + 1:
+                raise ValueError(f"At most {MAX_TRAINERS} trainers per import")
+            try:
+                record = json.loads(line)
+                name = str(record['name']).strip()
+                if not name:
+                    raise ValueError("trainer name is required")
+                inventory = {}
+                for item_name, quantity in record.get('inventory', ()):
+                    item_name = str(item_name).strip()
+                    inventory[item_name] = inventory.get(item_name, 0) + int(quantity)
+                pokemon = [_pokemon(values, fields, resolve) for values in record.get('pokemon', ())]
+                party = sum(p[_ACTIVE] for p in pokemon)
+                if party > trainer_store.PARTY_SIZE:
+                    raise ValueError(f"party has {party} Pokémon (max {trainer_store.PARTY_SIZE})")
+            except (AttributeError, KeyError, TypeError, ValueError) as e:
+                raise ValueError(f"line {number}: {e}") from e
+            yield name, record.get('created_at'), inventory, pokemon
+        if header is None:
+            raise ValueError("Empty trainer export")
+
+
+def load(conn, fileobj, species_catalog):
+    """Import every trainer in a dump() stream as new trainers.
+
+    Species are matched by name (case- and accent-insensitively); stat
+    blocks missing from the export are rolled.  Returns [(id, name)].
+    Raises ValueError, writing nothing, on any bad line.
+    """
+    try:
+        records = list(_records(fileobj, species_catalog))
+    except (OSError, EOFError, zlib.error) as e:
+        raise ValueError(f"Unreadable trainer export: {e}") from e
+
+    # Roll stat blocks the export did not carry, in one batch
+    missing = [p for _, _, _, pokemon in records for p in pokemon if p[_STATS] is None]
+    if missing:
+        rolled = trainer_stats.roll(seeds.numpy_rng(seeds.new_seed()), species_catalog,
+                                    [p[_NAME] for p in missing], [p[_LEVEL] for p in missing])
+        for p, stats in zip(missing, rolled):
+            p[_STATS:] = stats
+
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        # New trainers get explicit ids past anything AUTOINCREMENT has handed out
+        first = conn.execute(
+            """SELECT MAX(COALESCE((SELECT seq FROM sqlite_sequence WHERE name = 'trainers'), 0),
+                          COALESCE((SELECT MAX(id) FROM trainers), 0)) + 1""").fetchone()[0]
+        ids = range(first, first + len(records))
+        conn.executemany(
+            "INSERT INTO trainers (id, name, created_at) VALUES (?, ?, COALESCE(?, CURRENT_TIMESTAMP))",
+            [(trainer_id, name, created_at) for trainer_id, (name, created_at, _, _) in zip(ids, records)])
+        conn.executemany(
+            "INSERT INTO trainer_inventory (trainer_id, item_name, quantity) VALUES (?, ?, ?)",
+            [(trainer_id, item_name, quantity)
+             for trainer_id, (_, _, inventory, _) in zip(ids, records)
+             for item_name, quantity in inventory.items() if quantity > 0])
+        conn.executemany(
+            f"""INSERT INTO trainer_pokemon (trainer_id, {', '.join(POKEMON_FIELDS)})
+                VALUES ({', '.join('?' * (len(POKEMON_FIELDS) + 1))})""",
+            [(trainer_id, *p) for trainer_id, (_, _, _, pokemon) in zip(ids, records) for p in pokemon])
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+    return [(trainer_id, name) for trainer_id, (name, _, _, _) in zip(ids, records)]
@@ -0,0 +1,95 @@
+import numpy as np
+
+import seeds
+import stat_blocks
+from encounter_rolls import StatLine
+from species_stats import STAT_COLUMNS
+
+# Rolled stats kept on trainer Pokémon.  Each Pokémon stores its stat
+# breakdown as plain integer columns (base_Atk, level_Atk, nature_Atk, ...)
+# plus hit_points, and the per-stat level-gain multipliers (mult_Atk, ...)
+# rolled once when it is added.  Level gains follow the stat_blocks rule,
+# multiplier * level // 5, so a level-up adds the difference between the
+# old and new level and a Pokémon levelled from 5 to 30 ends up where one
+# rolled at 30 would.  The 10% nature bonus and hit points are then
+# re-derived from the stored integers.  NULLs mean the species had no
+# stats to roll from.
+
+PARTS = ('base', 'level', 'nature')
+BLOCK_COLUMNS = tuple(f"{part}_{col}" for part in PARTS for col in STAT_COLUMNS) + ('hit_points',)
+MULTIPLIER_COLUMNS = tuple(f"mult_{col}" for col in STAT_COLUMNS)
+COLUMNS = BLOCK_COLUMNS + MULTIPLIER_COLUMNS
+_N = len(STAT_COLUMNS)
+
+
+def _block_table(blocks):
+    """(n, len(BLOCK_COLUMNS)) array of the stored stat block parts."""
+    return np.hstack([blocks.base, blocks.level, blocks.nature, blocks.hit_points[:, None]])
+
+
+def _values(blocks, multipliers):
+    """One COLUMNS-ordered tuple of ints per Pokémon in `blocks`."""
+    return [tuple(row) for row in np.hstack([_block_table(blocks), multipliers]).tolist()]
+
+
+def _columns(rows, part):
+    return np.array([[row[f"{part}_{col}"] for col in STAT_COLUMNS] for row in rows], dtype=np.int64)
+
+
+def _rolled(rng, base, levels):
+    """COLUMNS values for base stats rolled at `levels`."""
+    multipliers = stat_blocks.roll_multipliers(rng, len(levels))
+    return _values(stat_blocks.from_gains(base, stat_blocks.gains_at(multipliers, levels), levels), multipliers)
+
+
+def roll(rng, species_catalog, names, levels):
+    """COLUMNS values for newly added Pokémon; all None for unknown species."""
+    return [values if name in species_catalog else (None,) * len(COLUMNS)
+            for name, values in zip(names, _rolled(rng, species_catalog.base_stats(names), levels))]
+
+
+def level_up(rows, new_levels):
+    """COLUMNS values after each row moves up to new_levels[i].
+
+    `rows` carry level and the stored COLUMNS.  Nothing is rolled: each
+    stat gains mult * new // 5 - mult * old // 5.  Rows without stored
+    stats stay None.
+    """
+    values = [(None,) * len(COLUMNS)] * len(rows)
+    known = [i for i, row in enumerate(rows) if row['base_HP'] is not None]
+    if not known:
+        return values
+    known_rows = [rows[i] for i in known]
+    multipliers = _columns(known_rows, 'mult')
+    old = np.array([row['level'] for row in known_rows], dtype=np.int64)
+    levels = np.maximum(np.array([new_levels[i] for i in known], dtype=np.int64), old)
+    gain = (_columns(known_rows, 'level')
+            + stat_blocks.gains_at(multipliers, levels) - stat_blocks.gains_at(multipliers, old))
+    blocks = stat_blocks.from_gains(_columns(known_rows, 'base'), gain, levels)
+    for i, v in zip(known, _values(blocks, multipliers)):
+        values[i] = v
+    return values
+
+
+def stat_lines(row):
+    """StatLine per stat from a stored row, or () if it has no stats."""
+    if row['base_HP'] is None:
+        return ()
+    lines = []
+    for label, col in zip(stat_blocks.LABELS, STAT_COLUMNS):
+        base, level, nature = (row[f"{part}_{col}"] for part in PARTS)
+        lines.append(StatLine(label, base, level, nature, base + level + nature))
+    return tuple(lines)
+
+
+def backfill(conn):
+    """One-time migration: roll stats for Pokémon added before they were stored."""
+    rows = conn.execute(
+        f"""SELECT tp.id, tp.level, {', '.join(f'COALESCE(p.{col}, 0)' for col in STAT_COLUMNS)}
+            FROM trainer_pokemon tp JOIN pokemon p ON p.name = tp.pokemon_name""").fetchall()
+    if not rows:
+        return
+    values = _rolled(seeds.numpy_rng(seeds.new_seed()), [row[2:2 + _N] for row in rows], [row[1] for row in rows])
+    assignments = ', '.join(f"{col} = ?" for col in COLUMNS)
+    conn.executemany(f"UPDATE trainer_pokemon SET {assignments} WHERE id = ?",
+                     [v + (row[0],) for row, v in zip(rows, values)])
@@ -0,0 +1,410 @@
+import json
+
+import events
+import trainer_stats
+
+# Trainer sheets: trainers, their inventory and their Pokémon.  Every
+# query here is served by an index on trainer_id (the inventory's
+# UNIQUE (trainer_id, item_name), the Pokémon's (trainer_id, is_active,
+# pokemon_name)), so a sheet costs the same however many trainers or PC
+# Pokémon the database holds.
+#
+# Several players edit sheets at once, so every row carries a version
+# that each write bumps.  A write given the version the client read only
+# applies while it is still current (WHERE version = ?) and raises
+# Conflict otherwise.  Each edit is a single statement, so nothing holds
+# a transaction between reading a sheet and writing it, and the party
+# cap is checked inside the move/insert statement itself: two concurrent
+# moves cannot both take the sixth slot.  Every write to a sheet also
+# bumps the trainer's own version in the same transaction, so the
+# sheet-level guard (batch edits, deleting a trainer) catches any change
+# made since the sheet was read.
+#
+# After each committed write the changed rows are pushed to the trainer's
+# event stream (events.py) as a small diff: the rows' new state plus the
+# ids of any that were removed, then the new sheet version.
+
+PARTY_SIZE = 6
+
+# True while the :trainer_id party has a free slot
+_PARTY_HAS_ROOM = f"""(SELECT COUNT(*) FROM trainer_pokemon
+                       WHERE trainer_id = :trainer_id AND is_active = 1) < {PARTY_SIZE}"""
+
+
+class Conflict(Exception):
+    """A row changed since the client read its version."""
+
+
+def _versioned(sql, params, version):
+    """`sql` (ending in its WHERE clause) guarded by `version` when one is given."""
+    if version is None:
+        return sql, params
+    return sql + " AND version = :version", dict(params, version=int(version))
+
+
+def _missed(conn, table, row_id, what):
+    """The error for a guarded write that matched nothing: the row is gone
+    (LookupError) or its version moved on (Conflict).
+    """
+    if conn.execute(f"SELECT 1 FROM {table} WHERE id = ?", (row_id,)).fetchone() is None:
+        return LookupError(f"{what} no longer exists")
+    return Conflict(f"{what} was changed by someone else; reload and try again")
+
+
+# Fields a Pokémon / inventory diff carries
+POKEMON_EVENT_FIELDS = ('id', 'pokemon_name', 'nickname', 'level', 'exp', 'is_active', 'hit_points', 'version')
+ITEM_EVENT_FIELDS = ('id', 'item_name', 'quantity', 'version')
+
+
+def _publish(conn, trainer_id, event, table, fields, row_ids):
+    channel = events.trainer_channel(trainer_id)
+    ids = sorted({int(i) for i in row_ids})
+    if not ids or not events.hub.has_subscribers(channel):
+        return
+    rows = conn.execute(
+        f"""SELECT {', '.join(fields)} FROM {table}
+            WHERE trainer_id = ? AND id IN ({','.join('?' * len(ids))})""", [trainer_id, *ids]).fetchall()
+    found = {row['id'] for row in rows}
+    events.hub.publish(channel, event, {
+        'changed': [dict(row) for row in rows],
+        'removed': [i for i in ids if i not in found],
+    })
+
+
+def publish(conn, trainer_id, pokemon_ids=(), item_ids=()):
+    """Push the current state of the given rows and the sheet version to
+    the trainer's listeners.
+    """
+    channel = events.trainer_channel(trainer_id)
+    if not events.hub.has_subscribers(channel):
+        return
+    _publish(conn, trainer_id, 'pokemon', 'trainer_pokemon', POKEMON_EVENT_FIELDS, pokemon_ids)
+    _publish(conn, trainer_id, 'inventory', 'trainer_inventory', ITEM_EVENT_FIELDS, item_ids)
+    trainer = get_trainer(conn, trainer_id)
+    if trainer is not None:
+        events.hub.publish(channel, 'trainer', {'version': trainer['version']})
+
+
+def _bump_sheet(conn, trainer_id):
+    """Bump the sheet version along with a write to one of its rows."""
+    conn.execute("UPDATE trainers SET version = version + 1 WHERE id = ?", (trainer_id,))
+
+
+def list_trainers(conn):
+    return conn.execute("SELECT id, name, created_at FROM trainers ORDER BY created_at DESC").fetchall()
+
+
+def get_trainer(conn, trainer_id):
+    return conn.execute("SELECT * FROM trainers WHERE id = ?", (trainer_id,)).fetchone()
+
+
+def load_sheet(conn, trainer_id):
+    """(trainer, inventory, party, pc) in two queries, or None if unknown.
+
+    The inventory comes back with the trainer row as a JSON array; the
+    Pokémon are read straight off the index (PC then party, by name) and
+    split in Python, so no sort step runs however large the PC grows.
+    """
+    row = conn.execute(
+        """SELECT t.*,
+                  (SELECT json_group_array(json_object('id', i.id, 'item_name', i.item_name,
+                                                       'quantity', i.quantity, 'version', i.version))
+                   FROM (SELECT id, item_name, quantity, version FROM trainer_inventory
+                         WHERE trainer_id = t.id ORDER BY item_name) AS i) AS inventory_json
+           FROM trainers t WHERE t.id = ?""", (trainer_id,)).fetchone()
+    if row is None:
+        return None
+    inventory = json.loads(row['inventory_json'])
+    party, pc = [], []
+    for pkmn in conn.execute(
+            """SELECT * FROM trainer_pokemon WHERE trainer_id = ?
+               ORDER BY is_active, pokemon_name""", (trainer_id,)):
+        pkmn = dict(pkmn, stats=trainer_stats.stat_lines(pkmn))
+        (party if pkmn['is_active'] else pc).append(pkmn)
+    return row, inventory, party, pc
+
+
+def create_trainer(conn, name):
+    cur = conn.execute("INSERT INTO trainers (name) VALUES (?)", (name,))
+    conn.commit()
+    return cur.lastrowid
+
+
+def delete_trainer(conn, trainer_id, version=None):
+    """Delete a trainer and everything on their sheet.
+
+    Raises LookupError for an unknown trainer and Conflict if `version`
+    is given and no longer current.
+    """
+    with conn:
+        sql, params = _versioned("DELETE FROM trainers WHERE id = :id", {'id': trainer_id}, version)
+        if not conn.execute(sql, params).rowcount:
+            raise _missed(conn, 'trainers', trainer_id, "That trainer")
+        conn.execute("DELETE FROM trainer_inventory WHERE trainer_id = ?", (trainer_id,))
+        conn.execute("DELETE FROM trainer_pokemon WHERE trainer_id = ?", (trainer_id,))
+    events.hub.publish(events.trainer_channel(trainer_id), 'deleted', {'trainer_id': trainer_id})
+
+
+def add_item(conn, trainer_id, item_name, quantity):
+    """Add `quantity` of an item, stacking onto any existing entry."""
+    item_id = conn.execute(
+        """INSERT INTO trainer_inventory (trainer_id, item_name, quantity) VALUES (?, ?, ?)
+           ON CONFLICT (trainer_id, item_name)
+           DO UPDATE SET quantity = quantity + excluded.quantity, version = version + 1
+           RETURNING id""",
+        (trainer_id, item_name, quantity)).fetchone()[0]
+    _bump_sheet(conn, trainer_id)
+    conn.commit()
+    publish(conn, trainer_id, item_ids=[item_id])
+
+
+def set_item_quantity(conn, item_id, quantity, version=None):
+    """Set an entry's quantity (0 or less removes it); returns its trainer id.
+
+    Raises LookupError for an unknown entry and Conflict if `version` is
+    given and no longer current.
+    """
+    if quantity <= 0:
+        sql, params = _versioned("DELETE FROM trainer_inventory WHERE id = :id", {'id': item_id}, version)
+    else:
+        sql, params = _versioned(
+            "UPDATE trainer_inventory SET quantity = :quantity, version = version + 1 WHERE id = :id",
+            {'id': item_id, 'quantity': quantity}, version)
+    row = conn.execute(sql + " RETURNING trainer_id", params).fetchone()
+    if row is not None:
+        _bump_sheet(conn, row['trainer_id'])
+    conn.commit()
+    if row is None:
+        raise _missed(conn, 'trainer_inventory', item_id, "That item")
+    publish(conn, row['trainer_id'], item_ids=[item_id])
+    return row['trainer_id']
+
+
+def add_pokemon(conn, trainer_id, pokemon_name, nickname, level, nature, gender, is_shiny, is_active,
+                exp, growth_rate, stats):
+    """Insert a Pokémon; `stats` is its trainer_stats.COLUMNS values.
+
+    One meant for a full party goes to the PC instead.  Returns (id,
+    whether it joined the party).
+    """
+    columns = ('trainer_id', 'pokemon_name', 'nickname', 'level', 'nature', 'gender', 'is_shiny',
+               'exp', 'growth_rate') + trainer_stats.COLUMNS
+    params = dict(zip(columns, (trainer_id, pokemon_name, nickname, level, nature, gender, is_shiny,
+                                exp, growth_rate) + tuple(stats)))
+    params['is_active'] = int(bool(is_active))
+    row = conn.execute(
+        f"""INSERT INTO trainer_pokemon ({', '.join(columns)}, is_active)
+            SELECT {', '.join(':' + col for col in columns)}, :is_active AND {_PARTY_HAS_ROOM}
+            RETURNING id, is_active""", params).fetchone()
+    _bump_sheet(conn, trainer_id)
+    conn.commit()
+    publish(conn, trainer_id, pokemon_ids=[row['id']])
+    return row['id'], bool(row['is_active'])
+
+
+def delete_pokemon(conn, pokemon_id, version=None):
+    """Delete a Pokémon; returns its trainer id.
+
+    Raises LookupError for an unknown Pokémon and Conflict if `version`
+    is given and no longer current.
+    """
+    sql, params = _versioned("DELETE FROM trainer_pokemon WHERE id = :id", {'id': pokemon_id}, version)
+    row = conn.execute(sql + " RETURNING trainer_id", params).fetchone()
+    if row is not None:
+        _bump_sheet(conn, row['trainer_id'])
+    conn.commit()
+    if row is None:
+        raise _missed(conn, 'trainer_pokemon', pokemon_id, "That Pokémon")
+    publish(conn, row['trainer_id'], pokemon_ids=[pokemon_id])
+    return row['trainer_id']
+
+
+def _move(conn, trainer_id, pokemon_id, version, active):
+    """Move a Pokémon between party and PC in one guarded UPDATE.
+
+    Returns False only when the party is full; raises LookupError or
+    Conflict as delete_pokemon() does.
+    """
+    sql = """UPDATE trainer_pokemon SET is_active = :active, version = version + 1
+             WHERE id = :id AND trainer_id = :trainer_id AND is_active != :active"""
+    if active:
+        sql += f" AND {_PARTY_HAS_ROOM}"
+    sql, params = _versioned(sql, {'id': pokemon_id, 'trainer_id': trainer_id, 'active': active}, version)
+    moved = conn.execute(sql, params).rowcount
+    if moved:
+        _bump_sheet(conn, trainer_id)
+    conn.commit()
+    if moved:
+        publish(conn, trainer_id, pokemon_ids=[pokemon_id])
+        return True
+    # Nothing matched: find out which guard stopped it
+    row = conn.execute("SELECT is_active, version FROM trainer_pokemon WHERE id = ? AND trainer_id = ?",
+                       (pokemon_id, trainer_id)).fetchone()
+    if row is None:
+        raise LookupError("That Pokémon no longer exists")
+    if version is not None and row['version'] != int(version):
+        raise Conflict("That Pokémon was changed by someone else; reload and try again")
+    return bool(row['is_active']) == bool(active)
+
+
+def move_to_pc(conn, trainer_id, pokemon_id, version=None):
+    _move(conn, trainer_id, pokemon_id, version, 0)
+
+
+def move_to_party(conn, trainer_id, pokemon_id, version=None):
+    """Put a PC Pokémon in the party; False if the party is already full."""
+    return _move(conn, trainer_id, pokemon_id, version, 1)
+
+
+# Batch edits: {"op": ..., ...} objects applied in order in one
+# transaction.  Every statement is scoped to the trainer, so an id from
+# another sheet counts as unknown; an op carrying "version" only applies
+# while its row is still at that version.  Each op returns the id of the
+# row it touched, or None if it matched nothing.
+MAX_OPERATIONS = 500
+
+
+def _pokemon_id(op):
+    return int(op['pokemon_id'])
+
+
+def _item_id(op):
+    return int(op['item_id'])
+
+
+def _touched(conn, sql, params):
+    return params['id'] if conn.execute(sql, params).rowcount else None
+
+
+def _set_active(active):
+    def apply(conn, trainer_id, op):
+        sql, params = _versioned(
+            """UPDATE trainer_pokemon SET is_active = :active, version = version + 1
+               WHERE id = :id AND trainer_id = :trainer_id""",
+            {'id': _pokemon_id(op), 'trainer_id': trainer_id, 'active': active}, op.get('version'))
+        return _touched(conn, sql, params)
+    return apply
+
+
+def _delete_pokemon(conn, trainer_id, op):
+    sql, params = _versioned("DELETE FROM trainer_pokemon WHERE id = :id AND trainer_id = :trainer_id",
+                             {'id': _pokemon_id(op), 'trainer_id': trainer_id}, op.get('version'))
+    return _touched(conn, sql, params)
+
+
+def _add_item(conn, trainer_id, op):
+    item_name = str(op['item_name']).strip()
+    if not item_name:
+        raise ValueError("item_name is required")
+    item_id = conn.execute(
+        """INSERT INTO trainer_inventory (trainer_id, item_name, quantity) VALUES (?, ?, ?)
+           ON CONFLICT (trainer_id, item_name)
+           DO UPDATE SET quantity = quantity + excluded.quantity, version = version + 1
+           RETURNING id""",
+        (trainer_id, item_name, int(op.get('quantity', 1)))).fetchone()[0]
+    # A negative adjustment can empty the stack
+    conn.execute("DELETE FROM trainer_inventory WHERE id = ? AND quantity <= 0", (item_id,))
+    return item_id
+
+
+def _set_item(conn, trainer_id, op):
+    quantity = int(op['quantity'])
+    if quantity <= 0:
+        return _delete_item(conn, trainer_id, op)
+    sql, params = _versioned(
+        """UPDATE trainer_inventory SET quantity = :quantity, version = version + 1
+           WHERE id = :id AND trainer_id = :trainer_id""",
+        {'id': _item_id(op), 'trainer_id': trainer_id, 'quantity': quantity}, op.get('version'))
+    return _touched(conn, sql, params)
+
+
+def _delete_item(conn, trainer_id, op):
+    sql, params = _versioned("DELETE FROM trainer_inventory WHERE id = :id AND trainer_id = :trainer_id",
+                             {'id': _item_id(op), 'trainer_id': trainer_id}, op.get('version'))
+    return _touched(conn, sql, params)
+
+
+# op -> (apply, table and id field of the row it targets)
+OPERATIONS = {
+    'move_to_party': (_set_active(1), 'trainer_pokemon', 'pokemon_id'),
+    'move_to_pc': (_set_active(0), 'trainer_pokemon', 'pokemon_id'),
+    'delete_pokemon': (_delete_pokemon, 'trainer_pokemon', 'pokemon_id'),
+    'add_item': (_add_item, 'trainer_inventory', 'item_name'),
+    'set_item': (_set_item, 'trainer_inventory', 'item_id'),
+    'delete_item': (_delete_item, 'trainer_inventory', 'item_id'),
+}
+
+
+def _party_count(conn, trainer_id):
+    return conn.execute("SELECT COUNT(*) FROM trainer_pokemon WHERE trainer_id = ? AND is_active = 1",
+                        (trainer_id,)).fetchone()[0]
+
+
+def apply_batch(conn, trainer_id, operations, version=None):
+    """Apply `operations` atomically and return the new load_sheet().
+
+    The party cap holds for the batch as a whole: moves may pass through
+    a seven-Pokémon party mid-batch, but the result may not exceed six
+    (or grow a party that was already over).  Each batch bumps the
+    trainer's version; with `version` it only applies while the trainer
+    is still at it.  Raises LookupError for an unknown trainer, Conflict
+    for a stale version and ValueError for a bad operation; nothing is
+    written on any of them.
+    """
+    if not isinstance(operations, list) or not operations:
+        raise ValueError('"operations" must be a non-empty list')
+    if len(operations) > MAX_OPERATIONS:
+        raise ValueError(f"At most {MAX_OPERATIONS} operations per batch")
+
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        sql, params = _versioned("UPDATE trainers SET version = version + 1 WHERE id = :id",
+                                 {'id': trainer_id}, version)
+        if not conn.execute(sql, params).rowcount:
+            if get_trainer(conn, trainer_id) is None:
+                raise LookupError(f"Unknown trainer {trainer_id}")
+            raise Conflict("This sheet was changed by someone else; reload and try again")
+        party_before = _party_count(conn, trainer_id)
+        touched = {'trainer_pokemon': set(), 'trainer_inventory': set()}
+        for i, op in enumerate(operations, 1):
+            spec = OPERATIONS.get(op.get('op')) if isinstance(op, dict) else None
+            if spec is None:
+                raise ValueError(f"operation {i}: op must be one of {', '.join(OPERATIONS)}")
+            apply, table, id_field = spec
+            try:
+                row_id = apply(conn, trainer_id, op)
+            except KeyError as e:
+                raise ValueError(f"operation {i} ({op['op']}): missing {e.args[0]}") from e
+            except (TypeError, ValueError) as e:
+                raise ValueError(f"operation {i} ({op['op']}): {e}") from e
+            if row_id is None:
+                exists = conn.execute(f"SELECT 1 FROM {table} WHERE id = ? AND trainer_id = ?",
+                                      (int(op[id_field]), trainer_id)).fetchone()
+                if exists:
+                    raise Conflict(f"operation {i} ({op['op']}): changed by someone else; reload and try again")
+                raise ValueError(f"operation {i} ({op['op']}): not found on this trainer")
+            touched[table].add(row_id)
+        party_after = _party_count(conn, trainer_id)
+        if party_after > max(PARTY_SIZE, party_before):
+            raise ValueError(f"Party would have {party_after} Pokémon (max {PARTY_SIZE})")
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+    publish(conn, trainer_id, touched['trainer_pokemon'], touched['trainer_inventory'])
+    return load_sheet(conn, trainer_id)
+
+
+def sheet_dict(sheet):
+    """JSON-ready form of a load_sheet() result."""
+    trainer, inventory, party, pc = sheet
+
+    def pokemon(p):
+        return dict(p, stats=[s._asdict() for s in p['stats']])
+
+    return {
+        'trainer': {key: trainer[key] for key in trainer.keys() if key != 'inventory_json'},
+        'inventory': inventory,
+        'party': [pokemon(p) for p in party],
+        'pc': [pokemon(p) for p in pc],
+    }